@@ -1,20 +1,80 @@
-import os
+import time
 
-from business_layer.ptb_scheduler import PTBScheduler
-from presentation_layer.telegram_ui import TelegramBot
-from business_layer.converter import Converter
-from business_layer.currency_updater import CurrencyUpdaterCBRF
+STARTED = time.perf_counter()
+
+from multiprocessing import Queue
+
+from utilities.log_config import configure_logging
+from utilities.settings import get_settings
+from utilities.startup_report import StartupReport
+
+# The subsystems are imported by the functions below, so only the ones needed by the process are loaded.
+
+
+def run_worker(index: int, updates: Queue):
+    """
+    The function run in each worker process of the cluster. The rates are read from the snapshot shared by the front.
+    """
+    from business_layer.converter import Converter
+    from business_layer.currency_updater import CurrencyUpdaterSnapshot
+    from business_layer.ptb_scheduler import PTBScheduler
+    from presentation_layer.telegram_ui import TelegramBot, PERSISTENCE_FILE
+
+    settings = get_settings()
+    configure_logging(settings.log_level)
+    converter = Converter(CurrencyUpdaterSnapshot())
+    scheduler = PTBScheduler(partition=index)
+    ui = TelegramBot(converter=converter, token=settings.token, botname=settings.botname, scheduler=scheduler)
+    ui.run_worker(updates, f"{PERSISTENCE_FILE}.{index}")
+
+
+async def publish_rates():
+    """
+    Gathers the rates from CBRF and publishes them to the snapshot shared with the workers.
+    """
+    from business_layer.currency_updater import CurrencyUpdaterCBRF, CurrencyUpdaterSnapshot
+
+    await CurrencyUpdaterSnapshot.publish(CurrencyUpdaterCBRF())
 
 
 def main():
     """
     The main function initializes a Converter, a PTBScheduler, and a TelegramBot, then runs the UI.
+
+    If WORKERS > 1, the TelegramCluster is run instead: the updates are distributed between the worker processes.
+    If JOB_PERSISTENCE > 0, the stored jobs are moved to the tables of their owners first (see PTBScheduler.repartition).
+    If STARTUP_REPORT > 0, the durations of the startup phases are logged.
     """
-    converter = Converter(CurrencyUpdaterCBRF())
-    subscriber = PTBScheduler()
-    ui = TelegramBot(converter=converter, token=os.getenv("TOKEN"), botname=os.getenv("BOTNAME"), subscriber=subscriber)
+    settings = get_settings()
+    configure_logging(settings.log_level)
+    report = StartupReport(STARTED, enabled=settings.startup_report > 0)
+    if settings.workers > 1:
+        with report.phase("import cluster"):
+            from business_layer.ptb_scheduler import PTBScheduler
+            from presentation_layer.telegram_cluster import TelegramCluster
+        with report.phase("repartition jobs"):
+            PTBScheduler.repartition(settings.workers)
+        ui = TelegramCluster(token=settings.token, workers=settings.workers, worker_target=run_worker,
+                             refresher=publish_rates, snapshot_path=settings.snapshot_file)
+        report.log()
+        ui.run()
+        return
+    with report.phase("import converter"):
+        from business_layer.converter import Converter
+        from business_layer.currency_updater import CurrencyUpdaterCBRF
+    with report.phase("import scheduler"):
+        from business_layer.ptb_scheduler import PTBScheduler
+    with report.phase("import bot"):
+        from presentation_layer.telegram_ui import TelegramBot
+    with report.phase("repartition jobs"):
+        PTBScheduler.repartition(None)
+    with report.phase("init"):
+        converter = Converter(CurrencyUpdaterCBRF(), snapshot_path=settings.snapshot_file)
+        scheduler = PTBScheduler()
+        ui = TelegramBot(converter=converter, token=settings.token, botname=settings.botname, scheduler=scheduler)
+    report.log()
     ui.run()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
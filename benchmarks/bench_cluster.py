@@ -0,0 +1,193 @@
+"""
+Local multi-process check and benchmark of the cluster mode: the rates snapshot shared between worker processes
+and the distribution of the updates by chat id. Telegram is not involved: fake updates are dispatched through
+TelegramCluster.dispatch to the worker queues.
+
+Then the real bot workers (TelegramBot.run_worker) are run against the fake Bot API: every chat gets an answer
+with the subscription keyboard, a user other than the subscriber clicks it (as in a message sent via inline mode),
+and the notifications sent per chat are counted, so every subscription is checked to be kept and fired by exactly
+one worker.
+
+Usage:
+    python -m benchmarks.bench_cluster [workers] [updates] [chats]
+"""
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from multiprocessing import Queue
+
+from benchmarks.common import StaticUpdater
+from benchmarks.fake_servers import FakeBotAPI, start_server
+from loguru import logger
+from business_layer.converter import Converter
+from business_layer.currency_updater import CurrencyUpdaterSnapshot
+from business_layer.ptb_scheduler import PTBScheduler
+from presentation_layer import telegram_ui
+from presentation_layer.telegram_cluster import TelegramCluster, partition_of
+from presentation_layer.telegram_ui import TelegramBot
+from telegram import CallbackQuery, Chat, Message, Update, User
+
+
+NOTIFY_INTERVAL = 1
+NOTIFICATIONS = 3
+
+
+def worker(index: int, workers: int, snapshot: str, updates: Queue, results: Queue) -> None:
+    """
+    Consumes the updates, checks each one is owned by the worker and converts it with the shared snapshot.
+    The rates are read once before consuming, which is confirmed with ("ready", index), so the snapshot is not
+    republished before every worker saw the first version.
+    """
+    logger.remove()
+
+    async def consume():
+        converter = Converter(CurrencyUpdaterSnapshot(snapshot))
+        handled = misrouted = 0
+        versions = {(await converter.parse_request("1 usd"))[0].converted_amount}
+        results.put(("ready", index))
+        while (data := updates.get()) is not None:
+            if data == "reload":
+                versions.add((await converter.parse_request("1 usd"))[0].converted_amount)
+                continue
+            misrouted += partition_of(data["message"]["chat"]["id"], workers) != index
+            versions.add((await converter.parse_request(data["message"]["text"]))[0].converted_amount)
+            handled += 1
+        results.put((index, handled, misrouted, sorted(versions)))
+
+    asyncio.run(consume())
+
+
+class StaticUpdaterScaled(StaticUpdater):
+    @classmethod
+    async def get_currency_rates(cls):
+        rates = await super().get_currency_rates()
+        for rate in rates:
+            rate.rate *= 2
+        return rates
+
+
+def bot_worker(index: int, updates: Queue, bot_url: str, snapshot: str, directory: str) -> None:
+    """
+    Runs the bot worker the way app.run_worker does, but against the fake Bot API (with a token of its own, so
+    the messages sent are told apart by the worker) and with the daily plan fired every NOTIFY_INTERVAL seconds.
+    """
+    logger.remove()
+    telegram_ui.BOT_API_URL = bot_url
+    scheduler = PTBScheduler(partition=index)
+    scheduler.subscription_plans["daily"]["interval"] = NOTIFY_INTERVAL
+    ui = TelegramBot(converter=Converter(CurrencyUpdaterSnapshot(snapshot)), token=f"1:bench{index}",
+                     botname="bench_bot", scheduler=scheduler)
+    ui.run_worker(updates, os.path.join(directory, f"persistence.{index}"))
+
+
+async def wait_for(condition, timeout: float, what: str) -> None:
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise AssertionError(f"Timed out waiting for {what}")
+        await asyncio.sleep(0.05)
+
+
+async def check_notifications(workers: int, chats: int, snapshot: str) -> None:
+    """
+    Subscribes the chats through the real bot workers and checks every subscription is fired by exactly one worker.
+    """
+    bot_api = FakeBotAPI()
+    runner, bot_url = await start_server(bot_api.app)
+    ctx = multiprocessing.get_context("spawn")
+    cluster = TelegramCluster(token="bench", workers=workers, worker_target=None)
+    cluster.queues = [ctx.Queue() for _ in range(workers)]
+    directory = tempfile.mkdtemp()
+    processes = [ctx.Process(target=bot_worker, args=(index, queue, bot_url, snapshot, directory))
+                 for index, queue in enumerate(cluster.queues)]
+    for process in processes:
+        process.start()
+    chat_ids = [100_000 + 7 * i for i in range(chats)]
+    for i, chat_id in enumerate(chat_ids):
+        user = User(chat_id, f"user{chat_id}", False)
+        cluster.dispatch(Update(i, message=Message(i, datetime.now(timezone.utc), Chat(chat_id, Chat.PRIVATE),
+                                                   from_user=user, text="1 usd")))
+    await wait_for(lambda: all(bot_api.sent[chat_id] for chat_id in chat_ids), 60, "the answers")
+
+    for i, chat_id in enumerate(chat_ids):
+        markup = bot_api.sent[chat_id][0][1]["reply_markup"]
+        markup = json.loads(markup) if isinstance(markup, str) else markup
+        clicker = User(chat_id + 1, f"user{chat_id + 1}", False)  # owned by another worker unless workers == 1
+        cluster.dispatch(Update(chats + i, callback_query=CallbackQuery(
+            str(i), clicker, "bench", inline_message_id=f"inline{chat_id}",
+            data=markup["inline_keyboard"][0][0]["callback_data"])))
+    await wait_for(lambda: len(bot_api.edited) == chats, 30, "the subscriptions")
+    started = time.perf_counter()
+    await wait_for(lambda: all(len(bot_api.sent[chat_id]) > NOTIFICATIONS for chat_id in chat_ids),
+                   NOTIFICATIONS * NOTIFY_INTERVAL + 30, "the notifications")
+
+    for queue in cluster.queues:
+        queue.put(None)
+    for process in processes:
+        process.join()
+    stopped = time.perf_counter()
+    await runner.cleanup()
+
+    misplaced, excess = [], {}
+    for chat_id in chat_ids:
+        notifications = bot_api.sent[chat_id][1:]
+        if {params["bot_token"] for _, params in notifications} != {f"1:bench{partition_of(chat_id, workers)}"}:
+            misplaced.append(chat_id)
+        fired = int((stopped - bot_api.edited[f"inline{chat_id}"]) / NOTIFY_INTERVAL) + 1
+        if len(notifications) > fired:
+            excess[chat_id] = (len(notifications), fired)
+    sent = sum(len(bot_api.sent[chat_id]) - 1 for chat_id in chat_ids)
+    print(f"{workers} bot workers: {chats} subscriptions, {sent} notifications sent "
+          f"({sent / chats:.1f} per subscription in {stopped - started:.1f} s)")
+    assert not misplaced, f"Some subscriptions were not fired by their owner only: {misplaced}"
+    assert not excess, f"Some subscriptions were fired more often than scheduled (sent, at most): {excess}"
+
+
+def main(workers: int, total: int, chats: int) -> None:
+    logger.remove()
+    snapshot = os.path.join(tempfile.mkdtemp(), "rates.snapshot")
+    asyncio.run(CurrencyUpdaterSnapshot.publish(StaticUpdater(), snapshot))
+    ctx = multiprocessing.get_context("spawn")
+    cluster = TelegramCluster(token="bench", workers=workers, worker_target=None)
+    cluster.queues = [ctx.Queue() for _ in range(workers)]
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(index, workers, snapshot, queue, results))
+                 for index, queue in enumerate(cluster.queues)]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        assert results.get(timeout=60)[0] == "ready"
+    user = User(1, "bench", False)
+    start = time.perf_counter()
+    for i in range(total):
+        chat = Chat(i % 1000, Chat.PRIVATE)
+        cluster.dispatch(Update(i, message=Message(i, None, chat, from_user=user, text="1 usd")))
+    asyncio.run(CurrencyUpdaterSnapshot.publish(StaticUpdaterScaled(), snapshot))
+    for queue in cluster.queues:
+        queue.put("reload")
+        queue.put(None)
+    collected = sorted(results.get(timeout=60) for _ in processes)
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+    handled = sum(r[1] for r in collected)
+    misrouted = sum(r[2] for r in collected)
+    print(f"{workers} workers: {handled} updates in {elapsed:.2f} s ({handled / elapsed:.0f} updates/s), "
+          f"{misrouted=}")
+    for index, count, _, versions in collected:
+        print(f"  worker {index}: {count} updates, rates seen: {versions}")
+    assert handled == total, "Some updates were lost"
+    assert misrouted == 0, "Some updates were routed to a wrong worker"
+    assert all(len(r[3]) == 2 for r in collected), "The republished snapshot was not picked up by every worker"
+
+    asyncio.run(check_notifications(workers, chats, snapshot))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 4, int(sys.argv[2]) if len(sys.argv) > 2 else 10000,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 50)
@@ -0,0 +1,206 @@
+"""
+End-to-end load test of TelegramBot, Converter and PTBScheduler against the local stand-ins of the Bot API and
+of the CBRF endpoint (see fake_servers). The bot polls the fake Bot API as in production, while the benchmark
+pushes a configurable mix of inline queries and chat messages and fires the notifications of the subscribers.
+
+Reports p50/p99 latencies per kind of answer, throughput, RSS and the requests shed by the admission controller
+(--no-admission disables it to compare). The report could be saved (--output) and used
+as a baseline of a later run (--baseline): the run fails if p99 latencies or throughput regress beyond --tolerance.
+
+Usage:
+    python -m benchmarks.bench_e2e [--inline 500] [--chat 200] [--subscribers 200] [--rate 0] [--output FILE]
+                                   [--baseline FILE] [--tolerance 0.2] [--no-admission] [--log]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.fake_servers import FakeBotAPI, FakeCBRServer, start_server
+from loguru import logger
+from business_layer.converter import Converter
+from business_layer.currency_updater import CurrencyUpdaterCBRF
+from business_layer.ptb_scheduler import PTBScheduler
+from presentation_layer import telegram_ui
+from presentation_layer.telegram_ui import TelegramBot
+from telegram import CallbackQuery, Update, User
+from telegram.ext import CallbackContext
+
+
+INLINE_QUERIES = ["usd", "1 usd", "100 eur", "cny", "д", "дол", "евро", "2*50 gbp", "dolar", "франк"]
+CHAT_QUERIES = ["1 usd", "100 eur", "1000 cny", "5+5 kzt", "евор", "50 доллар"]
+UNANSWERED = ("inline_stale", "inline_superseded", "inline_uncached")
+
+
+def user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"}
+
+
+def inline_update(update_id: int, user_id: int, query: str) -> dict:
+    return {"update_id": update_id, "inline_query": {"id": str(update_id), "from": user(user_id), "query": query,
+                                                     "offset": ""}}
+
+
+def message_update(update_id: int, chat_id: int, text: str) -> dict:
+    return {"update_id": update_id, "message": {"message_id": update_id, "date": int(time.time()), "text": text,
+                                                "chat": {"id": chat_id, "type": "private"}, "from": user(chat_id)}}
+
+
+def percentile(values: list[float], share: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def rss_mb() -> tuple[float, float]:
+    """
+    Returns the current and the peak resident set size of the process in MB.
+    """
+    with open("/proc/self/statm") as f:
+        current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    return current, max(current, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10)
+
+
+async def subscribe(scheduler: PTBScheduler, app, chat_ids: range) -> None:
+    """
+    Subscribes the chats the same way the subscription button does.
+    """
+    context = CallbackContext(app)
+    for chat_id in chat_ids:
+        query = CallbackQuery(str(chat_id), User(chat_id, f"user{chat_id}", False), "bench",
+                              data={"cmd": scheduler.cmd_sub_label, "type": "daily", "chat_id": chat_id,
+                                    "data_for_scheduler": "100 usd"})
+        await scheduler.subscribe(Update(0, callback_query=query), context)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    bot_api, cbr = FakeBotAPI(), FakeCBRServer()
+    bot_runner, bot_url = await start_server(bot_api.app)
+    cbr_runner, cbr_url = await start_server(cbr.app)
+    telegram_ui.BOT_API_URL = bot_url
+    CurrencyUpdaterCBRF.URL = f"{cbr_url}/scripts/XML_daily.asp"
+    if args.no_admission:
+        telegram_ui.ADMISSION_MAX_PENDING = 0
+    rnd = random.Random(args.seed)
+
+    converter = Converter(CurrencyUpdaterCBRF())
+    scheduler = PTBScheduler()
+    ui = TelegramBot(converter=converter, token="1:bench", botname="bench_bot", scheduler=scheduler)
+    app = ui.build_app(persistence_file=os.path.join(tempfile.mkdtemp(), "persistence"))
+    expected = args.inline + args.chat + args.subscribers
+    started = time.perf_counter()
+    async with app:
+        await app.updater.start_polling(poll_interval=0, timeout=1, allowed_updates=Update.ALL_TYPES)
+        await app.start()
+        await ui.post_init(app)
+        await subscribe(scheduler, app, range(30_000, 30_000 + args.subscribers))
+
+        kinds = ["inline"] * args.inline + ["chat"] * args.chat
+        rnd.shuffle(kinds)
+        notify_at = len(kinds) // 2
+        started = time.perf_counter()
+        for update_id, kind in enumerate(kinds, start=1):
+            if update_id == notify_at + 1 and args.subscribers:
+                bot_api.notify_started = time.perf_counter()
+                now = datetime.now(timezone.utc)
+                for job in app.job_queue.jobs():
+                    job.job.modify(next_run_time=now)
+            if kind == "inline":
+                bot_api.push_update(inline_update(update_id, 10_000 + update_id, rnd.choice(INLINE_QUERIES)))
+            else:
+                bot_api.push_update(message_update(update_id, 20_000 + update_id, rnd.choice(CHAT_QUERIES)))
+            await asyncio.sleep(1 / args.rate if args.rate else 0)
+        deadline = time.perf_counter() + args.timeout
+        while bot_api.answered + dropped(ui) < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        await app.updater.stop()
+        await app.stop()
+        await ui.post_stop(app)
+    await ui.post_shutdown(app)
+    await bot_runner.cleanup()
+    await cbr_runner.cleanup()
+
+    rss, max_rss = rss_mb()
+    report = {
+        "answered": bot_api.answered,
+        "expected": expected,
+        "shed": dict(ui.admission.shed) if ui.admission else {},
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(bot_api.answered / elapsed, 1),
+        "rss_mb": round(rss, 1),
+        "max_rss_mb": round(max_rss, 1),
+        "cbr_requests": cbr.requests,
+        "latency_ms": {
+            kind: {"count": len(values), "p50": round(percentile(values, 0.5) * 1000, 2),
+                   "p99": round(percentile(values, 0.99) * 1000, 2), "max": round(max(values) * 1000, 2)}
+            for kind, values in bot_api.latencies.items()
+        },
+    }
+    return report
+
+
+def dropped(ui: TelegramBot) -> int:
+    """
+    Returns the number of the updates shed without an answer.
+    """
+    return sum(ui.admission.shed[reason] for reason in UNANSWERED) if ui.admission else 0
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Compares the report with the baseline one.
+
+    Returns:
+        list[str]: The regressions found.
+    """
+    regressions = []
+    if report["throughput_per_s"] < baseline["throughput_per_s"] * (1 - tolerance):
+        regressions.append(f"throughput: {report['throughput_per_s']} < {baseline['throughput_per_s']}")
+    for kind, stats in baseline["latency_ms"].items():
+        current = report["latency_ms"].get(kind)
+        if current and current["p99"] > stats["p99"] * (1 + tolerance):
+            regressions.append(f"{kind} p99: {current['p99']} ms > {stats['p99']} ms")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inline", type=int, default=500, help="number of inline queries")
+    parser.add_argument("--chat", type=int, default=200, help="number of chat messages")
+    parser.add_argument("--subscribers", type=int, default=200, help="number of notifications fanned out")
+    parser.add_argument("--rate", type=float, default=0, help="updates per second (0 - all at once)")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for the answers")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="file to save the report to")
+    parser.add_argument("--baseline", help="report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression share")
+    parser.add_argument("--no-admission", action="store_true", help="disable the admission controller")
+    parser.add_argument("--log", action="store_true", help="keep the application logging")
+    args = parser.parse_args()
+    if not args.log:
+        logger.remove()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if report["answered"] + sum(report["shed"].get(reason, 0) for reason in UNANSWERED) < report["expected"]:
+        sys.exit(f"Only {report['answered']} of {report['expected']} updates were answered")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit("Regressions found:\n" + "\n".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Event loop lag under mixed load: large CBRF XML parses along with a stream of small expressions and powers,
+with the work run inline or offloaded to the process pool (see utilities.executors).
+
+Usage:
+    python -m benchmarks.bench_executor [valutes] [parses]
+"""
+import asyncio
+import sys
+import time
+
+from benchmarks.common import CURRENCIES, StaticUpdater
+from benchmarks.fake_servers import FakeCBRServer
+from loguru import logger
+from business_layer.converter import Converter
+from business_layer.currency_updater import parse_cbr_xml
+from utilities.executors import Executors
+
+
+CONFIGS = {
+    "inline": Executors(),
+    "processes": Executors(processes=2, process_threshold=64 * 1024),
+}
+
+
+def large_xml(valutes: int) -> str:
+    xml = FakeCBRServer.render()
+    one = xml[xml.index("<Valute"):xml.index("</Valute>") + len("</Valute>")]
+    return xml.replace("</ValCurs>", one * (valutes - len(CURRENCIES)) + "</ValCurs>")
+
+
+async def probe_lag(lags: list[float], stop: asyncio.Event, interval: float = 0.001) -> None:
+    """
+    Measures how late the loop wakes up the sleeping coroutine.
+    """
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run(executors: Executors, xml: str, parses: int) -> dict:
+    converter = Converter(StaticUpdater(), executors)
+    expressions = ["1", "100", "2*50", "1000/3", "(1+2)*3", "7**300000"]
+    lags, stop = [], asyncio.Event()
+    probe = asyncio.create_task(probe_lag(lags, stop))
+    expression_timings = []
+
+    async def expressions_stream():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                await converter.parse_expression(expressions[len(expression_timings) % len(expressions)])
+            except ValueError:  # the power is out of the float range, but it is computed all the same
+                pass
+            expression_timings.append(time.perf_counter() - start)
+            await asyncio.sleep(0.0005)
+
+    stream = asyncio.create_task(expressions_stream())
+    start = time.perf_counter()
+    await asyncio.gather(*(executors.run(parse_cbr_xml, xml, size=len(xml)) for _ in range(parses)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await asyncio.gather(probe, stream)
+    executors.shutdown()
+    lags.sort()
+    return {"elapsed_s": elapsed, "lag_p50_ms": lags[len(lags) // 2] * 1000,
+            "lag_p99_ms": lags[int(len(lags) * 0.99)] * 1000, "lag_max_ms": lags[-1] * 1000,
+            "expressions": len(expression_timings)}
+
+
+def main(valutes: int, parses: int) -> None:
+    logger.remove()
+    xml = large_xml(valutes)
+    print(f"XML of {len(xml) / 2**20:.1f} MB parsed {parses} times")
+    for label, executors in CONFIGS.items():
+        res = asyncio.run(run(executors, xml, parses))
+        print(f"{label:>9}: {res['elapsed_s']:.2f} s, loop lag p50={res['lag_p50_ms']:.2f} ms, "
+              f"p99={res['lag_p99_ms']:.2f} ms, max={res['lag_max_ms']:.1f} ms, "
+              f"{res['expressions']} expressions served meanwhile")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000, int(sys.argv[2]) if len(sys.argv) > 2 else 4)
@@ -0,0 +1,50 @@
+"""
+Latency benchmark of Converter.match_curr for miss-heavy workloads.
+
+Usage:
+    python -m benchmarks.bench_fuzzy_match [iterations]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from benchmarks.common import CURRENCIES, StaticUpdater
+from loguru import logger
+from business_layer.converter import Converter
+
+
+def typo(word: str, rnd: random.Random) -> str:
+    i = rnd.randrange(len(word))
+    return word[:i] + word[i + 1:] if rnd.random() < 0.5 else word[:i] + word[i] + word[i:]
+
+
+async def run(iterations: int) -> None:
+    rnd = random.Random(42)
+    converter = Converter(StaticUpdater())
+    start = time.perf_counter()
+    await converter.update_rates()
+    print(f"index build: {(time.perf_counter() - start) * 1000:.2f} ms, {len(converter.fuzzy_index.terms)} terms, "
+          f"{len(converter.fuzzy_index.deletes)} deletes")
+    words = [w.lower() for name, _, _ in CURRENCIES for w in name.split() if len(w) > 3]
+    workloads = {
+        "exact": [symbol.lower() for _, symbol, _ in CURRENCIES],
+        "typo": [typo(w, rnd) for w in words],
+        "miss": ["".join(rnd.choice("абвгдежзиклмнопрстуф") for _ in range(rnd.randint(3, 9))) for _ in range(50)],
+    }
+    for label, queries in workloads.items():
+        timings = []
+        hits = 0
+        for i in range(iterations):
+            query = queries[i % len(queries)]
+            start = time.perf_counter()
+            hits += await converter.match_curr(query) is not None
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        print(f"{label:>6}: p50={timings[len(timings) // 2] * 1e6:8.1f} us, "
+              f"p99={timings[int(len(timings) * 0.99)] * 1e6:8.1f} us, hit ratio={hits / iterations:.2f}")
+
+
+if __name__ == "__main__":
+    logger.remove()
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,39 @@
+"""
+Cost and accuracy of the exact (Decimal) conversions compared to the float ones.
+
+Shows the float artifacts avoided by the exact mode, then the time per request of both modes for parsing the
+expression, converting it and formatting the answer.
+
+Usage:
+    python -m benchmarks.bench_money [iterations]
+"""
+import asyncio
+import sys
+import time
+
+from benchmarks.common import StaticUpdater
+from business_layer.converter import Converter
+from presentation_layer.telegram_ui import TelegramBot
+
+EXPRESSIONS = ["0.1+0.2 usd", "1.15*100 eur", "19.99*3 gbp", "1000000.05 cny", "(10.10+20.20)/3 jpy"]
+
+
+async def run(iterations: int) -> None:
+    converter = Converter(StaticUpdater())
+    await converter.update_rates()
+    print(f"{'request':<22} {'float':>28} {'exact':>28}")
+    for request in EXPRESSIONS:
+        approx = (await converter.parse_request(request, limit=1))[0]
+        exact = (await converter.parse_request(request, limit=1, exact=True))[0]
+        print(f"{request:<22} {approx.converted_amount!r:>28} {str(exact.converted_amount):>28}")
+    for exact in (False, True):
+        start = time.perf_counter()
+        for i in range(iterations):
+            conv_query = (await converter.parse_request(EXPRESSIONS[i % len(EXPRESSIONS)], limit=1, exact=exact))[0]
+            TelegramBot.converted_query_to_msg(conv_query)
+        per_request = (time.perf_counter() - start) / iterations * 1_000_000
+        print(f"{'exact' if exact else 'float'}: {per_request:.1f} us per request")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000))
@@ -0,0 +1,117 @@
+"""
+Deploy-time latency: how long the bot takes to stop while notifications are being sent.
+
+The subscribers' notifications are fired at once against the fake Bot API answering sendMessage in --send-delay
+seconds, then the bot is stopped the way run_polling does it. Reported are the duration of every shutdown phase and
+the number of notifications delivered; with --send-delay above --shutdown-timeout, the stop is bounded by the timeout.
+
+Checked are the deadline (the stop takes at most --shutdown-timeout plus STOP_MARGIN) and the notifications: all of
+them are delivered if the send takes well below the timeout, none if it takes longer (they are cancelled instead,
+unless the send takes longer than READ_TIMEOUT and fails by itself).
+
+Usage:
+    python -m benchmarks.bench_shutdown [--subscribers N] [--send-delay S] [--shutdown-timeout S]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.bench_e2e import subscribe
+from benchmarks.fake_servers import FakeBotAPI, FakeCBRServer, start_server
+from loguru import logger
+from business_layer.converter import Converter
+from business_layer.currency_updater import CurrencyUpdaterCBRF
+from business_layer.ptb_scheduler import PTBScheduler
+from presentation_layer import telegram_ui
+from presentation_layer.telegram_ui import TelegramBot
+from telegram import Update
+
+
+STOP_MARGIN = 1.0
+READ_TIMEOUT = 5.0  # the default of PTB: the slower sends fail by themselves before the deadline matters
+
+
+async def run(args: argparse.Namespace) -> dict:
+    bot_api, cbr = FakeBotAPI(send_delay=args.send_delay), FakeCBRServer()
+    bot_runner, bot_url = await start_server(bot_api.app)
+    cbr_runner, cbr_url = await start_server(cbr.app)
+    telegram_ui.BOT_API_URL = bot_url
+    telegram_ui.SHUTDOWN_TIMEOUT = args.shutdown_timeout
+    CurrencyUpdaterCBRF.URL = f"{cbr_url}/scripts/XML_daily.asp"
+
+    converter = Converter(CurrencyUpdaterCBRF())
+    scheduler = PTBScheduler()
+    ui = TelegramBot(converter=converter, token="1:bench", botname="bench_bot", scheduler=scheduler)
+    app = ui.build_app(persistence_file=os.path.join(tempfile.mkdtemp(), "persistence"))
+    phases = {}
+    async with app:
+        started = time.perf_counter()
+        await app.updater.start_polling(poll_interval=0, timeout=1, allowed_updates=Update.ALL_TYPES)
+        await app.start()
+        await ui.post_init(app)
+        phases["start"] = time.perf_counter() - started
+        await subscribe(scheduler, app, range(30_000, 30_000 + args.subscribers))
+        now = datetime.now(timezone.utc)
+        for job in app.job_queue.jobs():
+            job.job.modify(next_run_time=now)
+        while bot_api.calls["sendMessage"] < args.subscribers:
+            await asyncio.sleep(0.01)
+
+        stopping = started = time.perf_counter()
+        await app.updater.stop()
+        await app.stop()
+        phases["stop"] = time.perf_counter() - started
+        delivered = bot_api.message_id
+        cancelled = app.cancelled_on_stop
+        started = time.perf_counter()
+        await ui.post_stop(app)
+        phases["post_stop"] = time.perf_counter() - started
+        started = time.perf_counter()
+    phases["shutdown"] = time.perf_counter() - started
+    started = time.perf_counter()
+    await ui.post_shutdown(app)
+    phases["post_shutdown"] = time.perf_counter() - started
+    total = time.perf_counter() - stopping
+    await bot_runner.cleanup()
+    await cbr_runner.cleanup()
+    return {
+        "subscribers": args.subscribers,
+        "delivered": delivered,
+        "cancelled": cancelled,
+        "send_delay_s": args.send_delay,
+        "shutdown_timeout_s": args.shutdown_timeout,
+        "stop_total_s": round(total, 3),
+        "phases_s": {phase: round(duration, 3) for phase, duration in phases.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscribers", type=int, default=200)
+    parser.add_argument("--send-delay", type=float, default=0.5)
+    parser.add_argument("--shutdown-timeout", type=float, default=5)
+    args = parser.parse_args()
+    logger.remove()
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    check(report)
+
+
+def check(report: dict) -> None:
+    timeout, send_delay = report["shutdown_timeout_s"], report["send_delay_s"]
+    assert report["phases_s"]["stop"] <= timeout + STOP_MARGIN, \
+        f"The stop took {report['phases_s']['stop']} s, the deadline is {timeout} s"
+    if send_delay + STOP_MARGIN <= timeout:
+        assert report["cancelled"] == 0 and report["delivered"] == report["subscribers"], \
+            f"Only {report['delivered']} of {report['subscribers']} notifications are delivered"
+    elif timeout <= send_delay < READ_TIMEOUT:
+        assert report["cancelled"] == report["subscribers"] and report["delivered"] == 0, \
+            f"{report['cancelled']} of {report['subscribers']} notifications are cancelled at the deadline"
+
+
+if __name__ == "__main__":
+    main()
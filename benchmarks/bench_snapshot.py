@@ -0,0 +1,52 @@
+"""
+Cost of the rates snapshot: building it, writing the file, mapping it back (as a worker or a restarted bot does)
+and installing it into the converter, compared to gathering the rates as objects.
+
+Usage:
+    python -m benchmarks.bench_snapshot [iterations]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.common import StaticUpdater
+from loguru import logger
+from business_layer.converter import Converter
+from models.rates_snapshot import RatesSnapshot
+
+
+def measure(label: str, iterations: int, func) -> None:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    print(f"{label:<28} {(time.perf_counter() - start) / iterations * 1_000_000:>10.1f} us")
+
+
+def lookup(path: str, symbol: str) -> float:
+    snapshot = RatesSnapshot.load(path)
+    return next(snapshot.rate(i) for i in range(len(snapshot)) if snapshot.symbol(i) == symbol)
+
+
+async def run(iterations: int) -> None:
+    rates = await StaticUpdater.get_currency_rates()
+    snapshot = RatesSnapshot.from_rates(rates, 1)
+    path = os.path.join(tempfile.mkdtemp(), "rates.snapshot")
+    snapshot.write(path)
+    print(f"{snapshot}: {os.path.getsize(path)} bytes on disk")
+    measure("from_rates", iterations, lambda: RatesSnapshot.from_rates(rates, 1))
+    measure("write", iterations, lambda: snapshot.write(path))
+    measure("load (mmap)", iterations, lambda: RatesSnapshot.load(path))
+    measure("load + rate lookup", iterations, lambda: lookup(path, "USD"))
+    measure("load + all objects", iterations, lambda: RatesSnapshot.load(path).currency_rates)
+    converter = Converter(StaticUpdater())
+    measure("converter install", max(iterations // 100, 1), lambda: converter.install(RatesSnapshot.load(path)))
+    start = time.perf_counter()
+    Converter(StaticUpdater(), snapshot_path=path)
+    print(f"{'restart (restore)':<28} {(time.perf_counter() - start) * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    logger.remove()
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
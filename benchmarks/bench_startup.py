@@ -0,0 +1,88 @@
+"""
+Startup benchmark: the import time of app.py (as reported by `python -X importtime`) and the time from
+the start of `python app.py` to its first answer to an inline query, served by the local stand-ins of
+the Bot API and of the CBRF endpoint.
+
+Usage:
+    python -m benchmarks.bench_startup [runs]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_e2e import inline_update
+from benchmarks.fake_servers import FakeBotAPI, FakeCBRServer, start_server
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_MODULES = ["app", "business_layer.converter", "business_layer.ptb_scheduler", "presentation_layer.telegram_ui"]
+
+
+def import_times(top: int = 10) -> tuple[int, list[tuple[int, str]]]:
+    """
+    Returns the total import time of the modules loaded by app.py in the single process mode and the slowest
+    imports among them (cumulative, in microseconds).
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {', '.join(APP_MODULES)}"], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    total = 0
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            total += int(cumulative)
+        if depth <= 1:
+            times.append((int(cumulative), name.strip()))
+    return total, sorted(times, reverse=True)[:top]
+
+
+async def first_answer(env: dict, timeout: float = 30) -> float:
+    """
+    Runs app.py and returns the time from the process start to the first answer to an inline query.
+    """
+    bot_api, cbr = FakeBotAPI(), FakeCBRServer()
+    bot_runner, bot_url = await start_server(bot_api.app)
+    cbr_runner, cbr_url = await start_server(cbr.app)
+    env = {**env, "BOT_API_URL": bot_url, "URL": f"{cbr_url}/scripts/XML_daily.asp"}
+    started = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(sys.executable, "app.py", cwd=ROOT, env=env,
+                                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    bot_api.push_update(inline_update(1, 1000, "usd"))
+    try:
+        while not bot_api.latencies["inline"]:
+            if time.perf_counter() - started > timeout or process.returncode is not None:
+                raise RuntimeError("No answer from the bot")
+            await asyncio.sleep(0.005)
+        return time.perf_counter() - started
+    finally:
+        process.terminate()
+        await process.wait()
+        await bot_runner.cleanup()
+        await cbr_runner.cleanup()
+
+
+def main(runs: int) -> None:
+    total, slowest = import_times()
+    print(f"imports: {total / 1000:.1f} ms, slowest:")
+    for cumulative, name in slowest:
+        print(f"  {cumulative / 1000:8.1f} ms | {name}")
+    directory = tempfile.mkdtemp()
+    env = {**os.environ, "TOKEN": "1:bench", "BOTNAME": "bench_bot", "REGEXP": r"^[\d\.\+\-\*/\(\)]+$",
+           "PERSISTENCE_FILE": os.path.join(directory, "persistence")}
+    timings = []
+    for run in range(runs):
+        # a fresh snapshot file for every run: a restored one would let the bot answer before gathering the rates
+        env["SNAPSHOT_FILE"] = os.path.join(directory, f"rates.{run}.snapshot")
+        timings.append(asyncio.run(first_answer(env)))
+    timings.sort()
+    print(f"start to first answer: min={timings[0] * 1000:.0f} ms, median={timings[len(timings) // 2] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,34 @@
+"""
+Common fixtures of the benchmarks.
+"""
+import os
+
+os.environ.setdefault("REGEXP", r"^[\d\.\+\-\*/\(\)]+$")
+from business_layer.currency_updater import CurrencyUpdater
+from models.currency import Currency
+from models.currency_rate import Currency2RubRate
+
+
+CURRENCIES = [
+    ("Австралийский доллар", "AUD", 36), ("Азербайджанский манат", "AZN", 944), ("Фунт стерлингов", "GBP", 826),
+    ("Армянский драм", "AMD", 51), ("Белорусский рубль", "BYN", 933), ("Болгарский лев", "BGN", 975),
+    ("Бразильский реал", "BRL", 986), ("Венгерский форинт", "HUF", 348), ("Вьетнамский донг", "VND", 704),
+    ("Гонконгский доллар", "HKD", 344), ("Грузинский лари", "GEL", 981), ("Датская крона", "DKK", 208),
+    ("Дирхам ОАЭ", "AED", 784), ("Доллар США", "USD", 840), ("Евро", "EUR", 978), ("Египетский фунт", "EGP", 818),
+    ("Индийская рупия", "INR", 356), ("Индонезийская рупия", "IDR", 360), ("Казахстанский тенге", "KZT", 398),
+    ("Канадский доллар", "CAD", 124), ("Катарский риал", "QAR", 634), ("Киргизский сом", "KGS", 417),
+    ("Китайский юань", "CNY", 156), ("Молдавский лей", "MDL", 498), ("Новозеландский доллар", "NZD", 554),
+    ("Норвежская крона", "NOK", 578), ("Польский злотый", "PLN", 985), ("Румынский лей", "RON", 946),
+    ("СДР (специальные права заимствования)", "XDR", 960), ("Сингапурский доллар", "SGD", 702),
+    ("Таджикский сомони", "TJS", 972), ("Таиландский бат", "THB", 764), ("Турецкая лира", "TRY", 949),
+    ("Новый туркменский манат", "TMT", 934), ("Узбекский сум", "UZS", 860), ("Украинская гривна", "UAH", 980),
+    ("Чешская крона", "CZK", 203), ("Шведская крона", "SEK", 752), ("Швейцарский франк", "CHF", 756),
+    ("Сербский динар", "RSD", 941), ("Южноафриканский рэнд", "ZAR", 710), ("Вон Республики Корея", "KRW", 410),
+    ("Японская иена", "JPY", 392),
+]
+
+
+class StaticUpdater(CurrencyUpdater):
+    @classmethod
+    async def get_currency_rates(cls):
+        return [Currency2RubRate(Currency(name, symbol, code), 1.0 + code / 100) for name, symbol, code in CURRENCIES]
@@ -0,0 +1,146 @@
+"""
+Local stand-ins of the Telegram Bot API and of the CBRF daily rates endpoint for the benchmarks.
+"""
+import asyncio
+import time
+from collections import defaultdict, deque
+
+from aiohttp import web
+
+from benchmarks.common import CURRENCIES
+
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+class FakeBotAPI:
+    def __init__(self, send_delay: float = 0):
+        """
+        Initializes the stand-in of the Bot API: the updates are served to getUpdates from the queue filled with
+        push_update, the answers are recorded along with their latencies (since the update was pushed), the messages
+        sent are kept per chat (along with the token of the bot which sent them, in bot_token) and the inline
+        messages edited by their ids.
+
+        :param send_delay: How long sendMessage takes, in seconds (to simulate a slow Bot API).
+        """
+        self.send_delay = send_delay
+        self.updates: deque[dict] = deque()
+        self.new_updates = asyncio.Event()
+        self.pending_inline: dict[str, float] = {}
+        self.pending_chat: dict[int, deque[float]] = defaultdict(deque)
+        self.notify_started: float | None = None
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.calls: dict[str, int] = defaultdict(int)
+        self.sent: dict[int, list[tuple[float, dict]]] = defaultdict(list)
+        self.edited: dict[str, float] = {}
+        self.message_id = 0
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+
+    def push_update(self, update: dict) -> None:
+        """
+        Puts the update to be served by getUpdates and starts its latency measurement.
+        """
+        now = time.perf_counter()
+        if "inline_query" in update:
+            self.pending_inline[update["inline_query"]["id"]] = now
+        elif "message" in update:
+            self.pending_chat[update["message"]["chat"]["id"]].append(now)
+        self.updates.append(update)
+        self.new_updates.set()
+
+    @property
+    def answered(self) -> int:
+        return sum(len(latencies) for latencies in self.latencies.values())
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = {key: value for key, value in (await request.post()).items()}
+        params["bot_token"] = request.match_info["token"]
+        handler = getattr(self, f"api_{method}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    async def api_getMe(self, params: dict):
+        return BOT_USER
+
+    async def api_getUpdates(self, params: dict):
+        offset = int(params.get("offset") or 0)
+        while self.updates and self.updates[0]["update_id"] < offset:
+            self.updates.popleft()
+        if not self.updates:
+            self.new_updates.clear()
+            try:
+                await asyncio.wait_for(self.new_updates.wait(), min(float(params.get("timeout") or 0), 0.5))
+            except asyncio.TimeoutError:
+                pass
+        return list(self.updates)[:int(params.get("limit") or 100)]
+
+    async def api_answerInlineQuery(self, params: dict):
+        started = self.pending_inline.pop(params["inline_query_id"], None)
+        if started is not None:
+            self.latencies["inline"].append(time.perf_counter() - started)
+        return True
+
+    async def api_sendMessage(self, params: dict):
+        if self.send_delay:
+            await asyncio.sleep(self.send_delay)
+        chat_id = int(params["chat_id"])
+        pending = self.pending_chat.get(chat_id)
+        if pending:
+            self.latencies["chat"].append(time.perf_counter() - pending.popleft())
+        elif self.notify_started is not None:
+            self.latencies["notify"].append(time.perf_counter() - self.notify_started)
+        self.sent[chat_id].append((time.perf_counter(), params))
+        self.message_id += 1
+        return {"message_id": self.message_id, "date": int(time.time()), "from": BOT_USER,
+                "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")}
+
+    async def api_editMessageText(self, params: dict):
+        if "inline_message_id" in params:
+            self.edited[params["inline_message_id"]] = time.perf_counter()
+        return True
+
+
+class FakeCBRServer:
+    def __init__(self):
+        """
+        Initializes the stand-in of the CBRF daily rates endpoint serving the CURRENCIES.
+        """
+        self.requests = 0
+        self.app = web.Application()
+        self.app.router.add_get("/scripts/XML_daily.asp", self.handle)
+
+    @staticmethod
+    def render() -> str:
+        valutes = "".join(
+            f'<Valute ID="R{code:05d}"><NumCode>{code:03d}</NumCode><CharCode>{symbol}</CharCode><Nominal>1</Nominal>'
+            f'<Name>{name}</Name><Value>{1 + code / 100:.4f}</Value><VunitRate>{1 + code / 100:.4f}</VunitRate>'
+            f'</Valute>'.replace(".", ",")
+            for name, symbol, code in CURRENCIES
+        )
+        return f'<?xml version="1.0" encoding="windows-1251"?><ValCurs Date="01.01.2024" name="Foreign Currency Market">' \
+               f'{valutes}</ValCurs>'
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        return web.Response(text=self.render(), content_type="application/xml")
+
+
+async def start_server(app: web.Application) -> tuple[web.AppRunner, str]:
+    """
+    Starts the aiohttp application on a free local port.
+
+    Returns:
+        tuple[web.AppRunner, str]: The runner (to be cleaned up) and the base URL of the server.
+    """
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # pylint: disable=W0212
+    return runner, f"http://127.0.0.1:{port}"
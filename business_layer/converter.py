@@ -1,76 +1,227 @@
+import asyncio
 import re
 from business_layer.currency_updater import CurrencyUpdater
 from datetime import datetime
+from decimal import Context, Decimal, InvalidOperation, Overflow, ROUND_HALF_EVEN, localcontext
 from models.currency_rate import Currency2RubRate
 from models.converted_query import ConvertedQuery
+from models.rates_snapshot import RatesSnapshot
+from utilities.fuzzy_index import FuzzyIndex
+from utilities.settings import get_settings
+from utilities.executors import Executors, get_executors
+from utilities.tracing import span
+from collections import Counter
 from typing import Any, Iterable
-import os
-import sys
 from loguru import logger
 
 
-logger.remove()
-logger.add(sys.stdout, level="TRACE", format="<green>{time}</green> | <blue>{module}</blue> | <lvl>{level}</lvl> | "
-                                             "{message}", serialize=False)
-REGEXP = os.getenv("REGEXP")
+REGEXP = get_settings().regexp
+MONEY_PRECISION = get_settings().money_precision
+# the decimal context of the exact conversions (see ConvertedQuery)
+MONEY_CONTEXT = Context(prec=MONEY_PRECISION, rounding=ROUND_HALF_EVEN)
+NUMBER = re.compile(r"\d+(?:\.\d*)?|\.\d+")
+FUZZY_MAX_DISTANCE = get_settings().fuzzy_max_distance
+ALIASES = {
+    "USD": ("dollar", "доллар", "бакс"),
+    "EUR": ("euro", "евро"),
+    "CNY": ("yuan", "юань"),
+    "GBP": ("pound", "фунт"),
+    "JPY": ("yen", "иена", "йена"),
+    "CHF": ("franc", "франк"),
+    "KZT": ("tenge", "тенге"),
+    "TRY": ("lira", "лира"),
+}
+
+
+def evaluate(expression: str) -> float:
+    """
+    Evaluates the expression validated by Converter.parse_expression (module-level to be run in the process pool).
+    """
+    return float(eval(expression))
+
+
+def evaluate_exact(expression: str, precision: int = MONEY_PRECISION) -> Decimal:
+    """
+    Evaluates the expression validated by Converter.parse_expression in Decimal: every number of the expression
+    is turned into Decimal, so e.g. '0.1+0.2' is exactly 0.3 (module-level to be run in the process pool).
+    """
+    with localcontext(prec=precision, rounding=ROUND_HALF_EVEN):
+        result = eval(NUMBER.sub(lambda m: f"Decimal('{m.group()}')", expression), {"Decimal": Decimal})
+    return Decimal(result)
 
 
 class Converter:
-    def __init__(self, updater: CurrencyUpdater):
+    def __init__(self, updater: CurrencyUpdater, executors: Executors | None = None,
+                 snapshot_path: str | None = None):
         """
         Initializes the CurrencyUpdater object with the provided updater.
 
         :param updater (CurrencyUpdater): The CurrencyUpdater object to be initialized with.
+        :param executors (Executors, optional): The executors to offload heavy expressions to. Defaults to the
+        executors of the process.
+        :param snapshot_path (str, optional): The file to keep the rates snapshot in: it is restored from the file
+        right away (so a restart does not wait for the rates) and written on every update. Defaults to None.
 
         :returns None
         """
         self.regexp = REGEXP
         self.updater: CurrencyUpdater = updater
-        self.update_dt = None
+        self.executors = executors or get_executors()
+        self.snapshot_path = snapshot_path
+        self.snapshot: RatesSnapshot | None = None
         self.matching = {}
-        self.currency_rates = []
+        self.fuzzy_index = FuzzyIndex(FUZZY_MAX_DISTANCE)
+        self.popularity = Counter()
+        self.ranking: dict[str, int] = {}
+        self._update_task = None
+        self.update_listeners = []
+        if snapshot_path:
+            try:
+                self.install(RatesSnapshot.load(snapshot_path))
+                logger.info(f"Rates are restored from '{snapshot_path}': {self.snapshot}")
+            except FileNotFoundError:
+                pass
+            except ValueError as e:
+                logger.warning(f"Rates are not restored: {e}")
+
+    @property
+    def update_dt(self) -> datetime | None:
+        return self.snapshot.created if self.snapshot else None
+
+    @property
+    def version(self) -> int | None:
+        """
+        The version of the rates snapshot in use, the caches of anything derived from the rates key on it.
+        """
+        return self.snapshot.version if self.snapshot else None
+
+    @property
+    def currency_rates(self) -> list[Currency2RubRate]:
+        return self.snapshot.currency_rates if self.snapshot else []
 
     async def update_rates(self):
         """
-        Updates the rates utilizing updater object.
+        Updates the rates utilizing updater object: the next version of the rates snapshot is installed
+        (and written to self.snapshot_path if set).
+        The functions of self.update_listeners are called (without arguments) once the rates are replaced.
+        """
+        snapshot = await self.updater.get_snapshot(self.version + 1 if self.snapshot else 1)
+        self.install(snapshot)
+        if self.snapshot_path:
+            await asyncio.to_thread(snapshot.write, self.snapshot_path)
+        for listener in self.update_listeners:
+            listener()
 
-        self.matching dict is calculated straight away based on the updated rates.
+    def install(self, snapshot: RatesSnapshot) -> None:
         """
-        self.update_dt = datetime.today()
-        self.matching = {'name': {}, 'code': {}, 'symbol': {}}
-        self.currency_rates = await self.updater.get_currency_rates()
-        for curr_rate in self.currency_rates:
-            self.matching['name'][curr_rate.curr.name.lower()] = curr_rate
-            self.matching['symbol'][curr_rate.curr.symbol.lower()] = curr_rate
+        Replaces the rates with the snapshot.
+
+        self.matching dict and the typo-tolerant self.fuzzy_index are calculated straight away based on the names
+        and symbols columns of the snapshot: they refer to the positions of the currencies within it, so the
+        Currency2RubRate objects are created for the matched currencies only (see match_curr).
+        They are replaced along with the snapshot once built, so concurrent requests keep using the previous ones
+        meanwhile. Along with them, the popularity is frozen into self.ranking: the matches are ranked the same way
+        until the next snapshot, so the pages of a query (see parse_request offset) never overlap or skip a currency.
+        """
+        matching = {'name': {}, 'code': {}, 'symbol': {}, 'alias': {}}
+        fuzzy_terms = []
+        for i in range(len(snapshot)):
+            name = snapshot.name(i).lower()
+            symbol = snapshot.symbol(i)
+            matching['name'][name] = i
+            matching['symbol'][symbol.lower()] = i
+            fuzzy_terms.extend((term, i) for term in {name, symbol.lower(), *name.split()})
+            for alias in ALIASES.get(symbol, ()):
+                matching['alias'][alias] = i
+                fuzzy_terms.append((alias, i))
+        self.fuzzy_index = FuzzyIndex.build(fuzzy_terms, FUZZY_MAX_DISTANCE)
+        self.snapshot = snapshot
+        self.matching = matching
+        self.ranking = dict(self.popularity)
+
+    async def refresh_if_outdated(self) -> None:
+        """
+        Updates the rates if they were not gathered yet or are outdated.
+        """
+        if self.update_dt is not None and not self.updater.is_outdated(self.update_dt):
+            return
+        await self.refresh()
+
+    @property
+    def refreshing(self) -> bool:
+        return self._update_task is not None
+
+    async def refresh(self) -> None:
+        """
+        Updates the rates. Concurrent callers share a single update instead of requesting the rates each.
+        """
+        if self._update_task is None:
+            self._update_task = asyncio.ensure_future(self.update_rates())
+            self._update_task.add_done_callback(lambda _: setattr(self, "_update_task", None))
+        with span("refresh_wait"):
+            await asyncio.shield(self._update_task)
+
+    async def close(self, timeout: float = 0) -> None:
+        """
+        Lets the update of the rates in progress (if any) finish within timeout seconds, then cancels it, so the
+        connection to the source of the rates is closed before the event loop is.
+        """
+        task = self._update_task
+        if task is None:
+            return
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if not done:
+            task.cancel()
+            logger.warning("Update of the rates is cancelled on shutdown")
 
     async def match_curr(self, requested_curr) -> Iterable[Currency2RubRate] | None:
         """
         A function to match the requested currency with the available currency rates.
         :param requested_curr: The currency to be matched.
 
-        The matching is based on the currency code and name.
+        The matching is based on the currency code, name and aliases. Matches are ranked by relevance:
+        exact code, exact name or alias, prefix, substring; ties are broken by popularity as of the snapshot
+        installed (see install and register_usage).
+        Only if nothing is matched, the typo-tolerant index is consulted (ranked by edit distance).
 
         Returns:
             An iterable of Currency2RubRate if there is a match, otherwise None.
         """
         curr = requested_curr.lower()
-        matched = []
-        if self.update_dt is None:
-            await self.update_rates()
-        if (datetime.today() - self.update_dt).days >= 1:
-            await self.update_rates()
+        ranks = {}
+        await self.refresh_if_outdated()
+        snapshot = self.snapshot
         for key in self.matching.keys():
             if curr in self.matching[key]:
-                matched.append(self.matching[key][curr])
+                i = self.matching[key][curr]
+                tier = 0 if key == 'symbol' else 1
+                ranks[i] = min(tier, ranks.get(i, tier))
                 continue
-            for label in self.matching[key]:
-                if label.find(curr) != -1:
-                    matched.append(self.matching[key][label])
-        if len(matched) > 0:
-            return matched
+            for label, i in self.matching[key].items():
+                pos = label.find(curr)
+                if pos != -1:
+                    tier = 2 if pos == 0 else 3
+                    ranks[i] = min(tier, ranks.get(i, tier))
+        if len(ranks) == 0:
+            for distance, i in self.fuzzy_index.lookup(curr):
+                ranks[i] = 4 + distance
+        if len(ranks) > 0:
+            symbols = {i: snapshot.symbol(i) for i in ranks}
+            ranked = sorted(ranks, key=lambda i: (ranks[i], -self.ranking.get(symbols[i], 0), symbols[i]))
+            return [snapshot.currency_rate(i) for i in ranked]
         return None
 
-    async def parse_request(self, request: Any) -> Iterable[ConvertedQuery]:
+    def register_usage(self, symbol: str) -> None:
+        """
+        Increments the usage counter of the currency, which is used to rank matches in match_curr once the next
+        rates snapshot is installed.
+
+        :param symbol: The currency symbol (e.g. 'USD').
+        """
+        self.popularity[symbol.upper()] += 1
+
+    async def parse_request(self, request: Any, offset: int = 0, limit: int | None = None,
+                            exact: bool = False) -> Iterable[ConvertedQuery]:
         """
         A function that parses a request and returns an iterable of ConvertedQuery objects.
 
@@ -82,9 +233,16 @@ class Converter:
         It is also possible that amount is not provided (so, no spaces in the request), in which case
         it will be assumed to be 1.
 
+        Only the ranked matches within [offset, offset + limit) are converted, so callers could page through
+        the results without building all of them.
+
         Args:
             self: The object instance
             request (Any): The request to be parsed
+            offset (int): The number of ranked matches to skip. Defaults to 0.
+            limit (int, optional): The maximum number of matches to convert. Defaults to None (no limit).
+            exact (bool): Whether to convert in Decimal (for the answers to be kept) or in float (for the previews).
+                Defaults to False.
         Returns:
             Iterable[ConvertedQuery]: An iterable of ConvertedQuery objects
         Raises:
@@ -101,26 +259,36 @@ class Converter:
         else:
             currency_marker = req_params[0]
             expr = "1"
-        amount = await self.parse_expression(expr)
+        with span("parse_expression", expression=expr):
+            amount = await self.parse_expression(expr, exact)
         if currency_marker is None or currency_marker == "":
             raise ValueError(f"Currency is not recognized (empty): '{currency_marker}'")
-        if currs := await self.match_curr(currency_marker):
-            return [ConvertedQuery(curr_rate, amount) for curr_rate in currs]
+        with span("match_curr", currency=currency_marker):
+            currs = await self.match_curr(currency_marker)
+        if currs:
+            end = None if limit is None else offset + limit
+            try:
+                return [ConvertedQuery(curr_rate, amount, money_context=MONEY_CONTEXT)
+                        for curr_rate in currs[offset:end]]
+            except InvalidOperation:
+                raise ValueError(f"Amount is out of range: '{expr}'") from None
         else:
             raise ValueError(f"Currency '{currency_marker}' is not recognized")
 
-    async def parse_expression(self, expression: str) -> float:
+    async def parse_expression(self, expression: str, exact: bool = False) -> float | Decimal:
         """
-        A function that parses the given expression and returns the result as a float.
+        A function that parses the given expression and returns the result as a float (or Decimal if exact).
 
         The parsing is based on a regular expression which is intended to check if the expression
-        is valid (could be evaluated)
+        is valid (could be evaluated). The expressions with a power are evaluated in the process pool if it is
+        enabled (see utilities.executors), the rest is evaluated inline.
 
         Args:
             expression (str): The expression to be parsed.
+            exact (bool): Whether to evaluate the expression in Decimal. Defaults to False.
 
         Returns:
-            float: The result of the parsed expression.
+            float | Decimal: The result of the parsed expression.
         """
         regexp = self.regexp
         if not re.match(regexp, expression):
@@ -128,4 +296,13 @@ class Converter:
         if expression.startswith("/") or expression.startswith("*"):
             raise ValueError(f"Invalid expression: '{expression}'")
         logger.trace(f"Expression '{expression}' is valid")
-        return float(eval(expression))
\ No newline at end of file
+        func = evaluate_exact if exact else evaluate
+        try:
+            # the power is the only operation whose cost is not bounded by the length of the (short) expression
+            if "**" in expression:
+                return await self.executors.run_heavy(func, expression)
+            return func(expression)
+        except (InvalidOperation, ZeroDivisionError):
+            raise ValueError(f"Invalid expression: '{expression}'") from None
+        except (OverflowError, Overflow):
+            raise ValueError(f"Amount is out of range: '{expression}'") from None
\ No newline at end of file
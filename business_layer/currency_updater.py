@@ -1,18 +1,41 @@
 from models.currency_rate import Currency2RubRate
 from models.currency import Currency
+from models.rates_snapshot import RatesSnapshot
+from utilities.settings import get_settings
+from utilities.executors import get_executors
+from datetime import datetime
+from decimal import Decimal
 from typing import Iterable, Protocol
 import xml.etree.ElementTree as ET
-import aiohttp
 import os
 from loguru import logger
-import sys
 
 
-logger.remove()
-logger.add(sys.stdout, level="TRACE", format="<green>{time}</green> | <blue>{module}</blue> | <lvl>{level}</lvl> | "
-                                             "{message}", serialize=False)
-URL = os.getenv("URL")
-TIMEOUT = int(os.getenv("TIMEOUT"))
+URL = get_settings().url
+TIMEOUT = get_settings().timeout
+SNAPSHOT_FILE = get_settings().snapshot_file
+
+
+def parse_cbr_xml(xml: str) -> list[tuple[str, str, int, Decimal]]:
+    """
+    Parses the XML of the CBRF API into the rows of (name, symbol, code, rate), the rate is exact (as quoted).
+
+    It is a module-level function of plain data, so it could be run in the process pool.
+    """
+    root_data = ET.fromstring(xml)
+    res = []
+    for curr in root_data:
+        for element in curr:
+            if element.tag == "Name":
+                name = element.text
+            elif element.tag == "CharCode":
+                symbol = element.text
+            elif element.tag == "NumCode":
+                code = int(element.text)
+            elif element.tag == "VunitRate":
+                rate = Decimal(element.text.replace(',', '.'))
+        res.append((name, symbol, code, rate))
+    return res
 
 
 class CurrencyUpdater(Protocol):
@@ -20,6 +43,18 @@ class CurrencyUpdater(Protocol):
     async def get_currency_rates(cls) -> Iterable[Currency2RubRate]:
         raise NotImplementedError
 
+    async def get_snapshot(self, version: int) -> RatesSnapshot:
+        """
+        Gathers the rates as a snapshot of the version provided (the updaters reading ready snapshots keep theirs).
+        """
+        return RatesSnapshot.from_rates(await self.get_currency_rates(), version)
+
+    def is_outdated(self, update_dt: datetime) -> bool:
+        """
+        Checks whether the rates gathered at update_dt should be updated.
+        """
+        return (datetime.today() - update_dt).days >= 1
+
 
 class CurrencyUpdaterCBRF(CurrencyUpdater):
     URL = URL
@@ -31,23 +66,68 @@ class CurrencyUpdaterCBRF(CurrencyUpdater):
         A function that fetches currency exchange rates and returns a list of Currency2RubRate objects
 
         It utilizes aiohttp library to make requests to the CBRF API and parse gathered XML.
+        aiohttp is imported on the first call to keep the startup fast.
+        Large XML is parsed in the process pool if it is enabled (see utilities.executors).
         """
+        import aiohttp
+
         async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(cls.TIMEOUT)) as session:
             async with session.get(cls.URL) as response:
                 logger.trace(f"Request to '{URL}':\nstatus is {response.status}")
                 xml = await response.text()
         logger.trace(f"{xml=}")
-        root_data = ET.fromstring(xml)
-        res = []
-        for curr in root_data:
-            for element in curr:
-                if element.tag == "Name":
-                    name = element.text
-                elif element.tag == "CharCode":
-                    symbol = element.text
-                elif element.tag == "NumCode":
-                    code = int(element.text)
-                elif element.tag == "VunitRate":
-                    rate = float(element.text.replace(',', '.'))
-            res.append(Currency2RubRate(Currency(name, symbol, code), rate))
-        return res
+        rows = await get_executors().run(parse_cbr_xml, xml, size=len(xml))
+        return [Currency2RubRate(Currency(name, symbol, code), float(rate), exact_rate=rate)
+                for name, symbol, code, rate in rows]
+
+
+class CurrencyUpdaterSnapshot(CurrencyUpdater):
+    def __init__(self, path: str = SNAPSHOT_FILE):
+        """
+        Initializes the updater reading the rates from the snapshot file shared between the worker processes.
+        The snapshot is written by a single refresher (see publish).
+
+        :param path (str): The path of the snapshot file.
+        """
+        self.path = path
+        self.mtime_ns = None
+
+    async def get_currency_rates(self) -> Iterable[Currency2RubRate]:
+        """
+        A function that reads the currency exchange rates from the shared snapshot file.
+        """
+        return (await self.get_snapshot(0)).currency_rates
+
+    async def get_snapshot(self, version: int) -> RatesSnapshot:
+        """
+        Maps the shared snapshot file (zero-copy), the version of the snapshot is the one published.
+        """
+        self.mtime_ns = os.stat(self.path).st_mtime_ns
+        return RatesSnapshot.load(self.path)
+
+    def is_outdated(self, update_dt: datetime) -> bool:
+        """
+        Checks whether the snapshot file was replaced since the last read.
+        """
+        try:
+            return os.stat(self.path).st_mtime_ns != self.mtime_ns
+        except FileNotFoundError:
+            logger.error(f"Snapshot '{self.path}' is not found")
+            return False
+
+    @staticmethod
+    async def publish(updater: CurrencyUpdater, path: str = SNAPSHOT_FILE) -> None:
+        """
+        Gathers the rates with the updater provided and writes them to the shared snapshot file.
+        The version of the snapshot is the next to the one of the file replaced.
+
+        :param updater (CurrencyUpdater): The updater to gather the rates with (e.g. CurrencyUpdaterCBRF).
+        :param path (str): The path of the snapshot file.
+        """
+        try:
+            version = RatesSnapshot.load(path).version + 1
+        except (FileNotFoundError, ValueError):
+            version = 1
+        snapshot = await updater.get_snapshot(version)
+        snapshot.write(path)
+        logger.info(f"Rates snapshot published: {snapshot}")
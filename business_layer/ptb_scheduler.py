@@ -1,26 +1,35 @@
-import os
+import asyncio
+from apscheduler.events import EVENT_SCHEDULER_START
+from collections import Counter
+from datetime import datetime
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, Application
 from business_layer.scheduler import Scheduler
-from utilities.custom_jobstore import PTBJobStore
-import sys
+from utilities.settings import get_settings
 from loguru import logger
 
 
-logger.remove()
-logger.add(sys.stdout, level="TRACE", format="<green>{time}</green> | <blue>{module}</blue> | <lvl>{level}</lvl> | "
-                                             "{message}", serialize=False)
-PSQL_URL = os.getenv("PSQL_URL")
-JOB_PERSISTENCE = int(os.getenv("JOB_PERSISTENCE", 0))
+PSQL_URL = get_settings().psql_url
+JOB_PERSISTENCE = get_settings().job_persistence
 
 
 class PTBScheduler(Scheduler):
-    def __init__(self):
+    def __init__(self, partition: int | None = None):
         """
         Initialize the object with predefined subscription plans.
+
+        :param partition: The index of the worker process in case several workers share the jobstore database.
+        Each worker keeps its jobs in a separate table, so every subscription is fired by its owner only.
         """
         super().__init__()
+        self.partition = partition
+        self.app = None
         self.notify = None
+        self.active = Counter()
+        self.subscribed = Counter()
+        self.unsubscribed = Counter()
+        self._counting: list[tuple[str, str, int]] | None = None
+        self._count_task = None
         self.subscription_plans = {
             "daily": {"label": "Ежедневно", "interval": 60*60*24},
             "weekly": {"label": "Еженедельно", "interval": 60*60*24*7},
@@ -70,16 +79,94 @@ class PTBScheduler(Scheduler):
 
     def adjust_tg(self, app: Application, callback_func, **kwargs) -> None:
         """
-        Adjusts the telegram application by adding a jobstore if JOB_PERSISTENCE is activated.
+        Adjusts the telegram application by adding a jobstore if JOB_PERSISTENCE is activated (the jobstore module
+        is imported only in this case).
         The jobstore is added to the app's job queue scheduler using the provided Application instance,
         callback function, and additional keyword arguments.
+        The callback function is used for the jobs scheduled by subscribe either way.
+        Once the job queue is started, the jobs are counted per plan (see count_jobs).
         """
+        self.app = app
+        self.notify = callback_func
+        app.job_queue.scheduler.add_listener(self.count_jobs, EVENT_SCHEDULER_START)
         if JOB_PERSISTENCE > 0:
-            logger.trace(f"Adding PTBJobStore, {PSQL_URL=}")
+            from utilities.custom_jobstore import PTBJobStore  # SQLAlchemy is heavy to import, so only if needed
+
+            tablename = self.tablename(self.partition)
+            logger.trace(f"Adding PTBJobStore, {PSQL_URL=}, {tablename=}")
             app.job_queue.scheduler.add_jobstore(
-                PTBJobStore(application=app, callback_func=callback_func, url=PSQL_URL),
+                PTBJobStore(application=app, callback_func=callback_func, url=PSQL_URL, tablename=tablename),
             )
-            self.notify = callback_func
+
+    def plan_of(self, interval: float) -> str | None:
+        """
+        Returns the subscription plan of the job interval (in seconds), None if there is no such plan.
+        """
+        return next((key for key, dct in self.subscription_plans.items() if dct["interval"] == interval), None)
+
+    def count_jobs(self, event=None) -> None:
+        """
+        Starts counting the jobs per plan (see _count_jobs), self.active is kept up to date by subscribe and
+        unsubscribe after that. Called once the job queue is started, so the numbers survive a restart with
+        JOB_PERSISTENCE.
+        """
+        self._counting = []
+        self._count_task = asyncio.ensure_future(self._count_jobs())
+
+    async def _count_jobs(self) -> None:
+        """
+        Counts the jobs per plan in a thread, as the stored jobs are all loaded (unpickled) to be counted.
+        The subscriptions made and removed meanwhile are recorded by subscribe and unsubscribe, and are applied
+        unless the jobs listed already reflect them.
+        """
+        try:
+            jobs = await asyncio.to_thread(self.app.job_queue.scheduler.get_jobs)
+        except Exception as e:
+            logger.error(f"Jobs are not counted: {e}")
+            return
+        finally:
+            changes, self._counting = self._counting, None
+        plans = {job.id: self.plan_of(job.trigger.interval.total_seconds()) for job in jobs}
+        active = Counter(plan for plan in plans.values() if plan is not None)
+        for job_id, plan, delta in changes:
+            if (delta > 0) != (job_id in plans):
+                active[plan] += delta
+        self.active = active
+        logger.trace(f"Jobs per plan: {dict(self.active)}")
+
+    def _count(self, job_id: str, plan: str, delta: int) -> None:
+        self.active[plan] += delta
+        if self._counting is not None:
+            self._counting.append((job_id, plan, delta))
+
+    @staticmethod
+    def tablename(partition: int | None) -> str:
+        """
+        Returns the name of the table the jobs of the partition are kept in.
+        """
+        return "apscheduler_jobs" if partition is None else f"apscheduler_jobs_{partition}"
+
+    @classmethod
+    def repartition(cls, workers: int | None) -> int:
+        """
+        Moves the stored jobs to the tables of their owners for the number of the workers given, so the subscriptions
+        are not orphaned once the number of the workers is changed (including a single process, None).
+        The chats are partitioned the same way TelegramCluster routes them: chat id modulo the number of the workers.
+        Has to be called before the workers are started.
+
+        :param workers: The number of the worker processes, None if the bot is run as a single process.
+        :return: The number of the jobs moved.
+        """
+        if JOB_PERSISTENCE <= 0:
+            return 0
+        from utilities.custom_jobstore import repartition
+
+        tablenames = [cls.tablename(None)] if workers is None else [cls.tablename(i) for i in range(workers)]
+        moved = repartition(PSQL_URL, cls.tablename(None), lambda chat_id: tablenames[chat_id % len(tablenames)],
+                            tablenames)
+        if moved:
+            logger.info(f"{moved} jobs are moved to the tables of {len(tablenames)} partitions")
+        return moved
 
     async def subscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
         """
@@ -111,10 +198,12 @@ class PTBScheduler(Scheduler):
                 logger.error(f"Data for scheduler is not specified within subscription meta and query is not specified")
                 return False
 
-        context.application.job_queue.run_repeating(self.notify, self.subscription_plans[type]["interval"],
-                                                    data=data,
-                                                    chat_id=chat_id,
-                                                    name=str(chat_id))
+        job = context.application.job_queue.run_repeating(self.notify, self.subscription_plans[type]["interval"],
+                                                          data=data,
+                                                          chat_id=chat_id,
+                                                          name=str(chat_id))
+        self._count(job.job.id, type, 1)
+        self.subscribed[type] += 1
         return True
 
     async def unsubscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
@@ -135,8 +224,45 @@ class PTBScheduler(Scheduler):
         job = context.application.job_queue.get_jobs_by_name(job_name)[0]
         if job:
             job.schedule_removal()
+            plan = self.plan_of(job.job.trigger.interval.total_seconds())
+            if plan is not None:
+                self._count(job.job.id, plan, -1)
+                self.unsubscribed[plan] += 1
             return True
         else:
             logger.error(f"Job with name {job_name} is not found")
             return False
 
+    async def next_run_time(self) -> datetime | None:
+        """
+        Returns the time of the nearest job run. Every job store looks it up by itself (e.g. a single indexed query
+        of SQLAlchemyJobStore), so the jobs are not scanned; the lookup is run in a thread not to block the loop.
+        """
+        if self.app is None or self.app.job_queue is None:
+            return None
+        return await asyncio.to_thread(self._next_run_time)
+
+    def _job_stores(self) -> list:
+        """
+        Returns the job stores of the scheduler. APScheduler 3 has no public access to them, so this is the only place
+        relying on its private attributes: the dict of the stores and the lock guarding it.
+        """
+        scheduler = self.app.job_queue.scheduler
+        with scheduler._jobstores_lock:
+            return list(scheduler._jobstores.values())
+
+    def _next_run_time(self) -> datetime | None:
+        run_times = [store.get_next_run_time() for store in self._job_stores()]
+        return min((run_time for run_time in run_times if run_time is not None), default=None)
+
+    async def stats(self) -> dict:
+        """
+        Returns the numbers of the subscriptions per plan (the current ones and the ones made and removed since the
+        start) and the nearest job run.
+        """
+        return {
+            "plans": {key: {"active": self.active[key], "subscribed": self.subscribed[key],
+                            "unsubscribed": self.unsubscribed[key]}
+                      for key in self.subscription_plans},
+            "next_run": await self.next_run_time(),
+        }
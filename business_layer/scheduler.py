@@ -1,12 +1,5 @@
 from telegram.ext import Application
 from typing import Protocol
-import sys
-from loguru import logger
-
-
-logger.remove()
-logger.add(sys.stdout, level="TRACE", format="<green>{time}</green> | <blue>{module}</blue> | <lvl>{level}</lvl> | "
-                                             "{message}", serialize=False)
 
 
 class Scheduler(Protocol):
@@ -34,3 +27,9 @@ class Scheduler(Protocol):
     async def unsubscribe(self, subscription_meta: dict, context: object) -> bool:
         raise NotImplementedError
 
+    async def stats(self) -> dict:
+        """
+        Returns the state of the scheduler for the operators (cheap to compute, the jobs are not scanned).
+        """
+        return {}
+
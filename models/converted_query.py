@@ -1,36 +1,43 @@
 from __future__ import annotations
 from datetime import datetime
+from decimal import Context, Decimal, getcontext
 import uuid
 from typing import Optional
 from models.currency_rate import Currency2RubRate
-import sys
-from loguru import logger
 
 
-logger.remove()
-logger.add(sys.stdout, level="TRACE", format="<green>{time}</green> | <blue>{module}</blue> | <lvl>{level}</lvl> | "
-                                             "{message}", serialize=False)
+MONEY_QUANTUM = Decimal("0.01")
 
 
 class ConvertedQuery:
     def __init__(self,
                  curr_rate: Currency2RubRate,
-                 amount: float,
+                 amount: float | Decimal,
                  query: Optional[str] = None,
+                 money_context: Optional[Context] = None,
                  ):
         """
         Initialize a new CurrencyConverter object.
 
         Constructs a query in case it's not provided.
+        If the amount is Decimal, the conversion is exact: the exact rate is used and the converted amount is
+        quantized to kopecks within the money context; otherwise it is calculated in float.
 
         :param curr_rate (Currency2RubRate): The currency to ruble exchange rate object.
-        :param amount (float): The amount of currency to convert.
+        :param amount (float | Decimal): The amount of currency to convert.
         :param query (Optional[str], optional): A string query. Defaults to None.
+        :param money_context (Optional[Context], optional): The decimal context of the exact conversion.
+        Defaults to None (the current context).
         """
         self.__id = str(uuid.uuid4())
         self.__curr_rate = curr_rate
         self.__amount = amount
-        self.__converted_amount = self.__amount * curr_rate.rate
+        if isinstance(amount, Decimal):
+            context = money_context or getcontext()
+            self.__converted_amount = context.multiply(amount, curr_rate.exact_rate).quantize(MONEY_QUANTUM,
+                                                                                              context=context)
+        else:
+            self.__converted_amount = self.__amount * curr_rate.rate
         if query is None:
             self.__query = self.query_constructor()
         else:
@@ -2,13 +2,6 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 import uuid
-import sys
-from loguru import logger
-
-
-logger.remove()
-logger.add(sys.stdout, level="TRACE", format="<green>{time}</green> | <blue>{module}</blue> | <lvl>{level}</lvl> | "
-                                             "{message}", serialize=False)
 
 
 class Currency:
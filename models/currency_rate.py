@@ -1,30 +1,29 @@
 from __future__ import annotations
 from datetime import datetime
+from decimal import Decimal
+from typing import Optional
 import uuid
 from models.currency import Currency
-import sys
-from loguru import logger
-
-
-logger.remove()
-logger.add(sys.stdout, level="TRACE", format="<green>{time}</green> | <blue>{module}</blue> | <lvl>{level}</lvl> | "
-                                             "{message}", serialize=False)
 
 
 class Currency2RubRate:
     def __init__(self,
                  curr: Currency,
-                 rate: float
+                 rate: float,
+                 exact_rate: Optional[Decimal] = None,
                  ):
         """
         Initialize the CurrencyConverter object with the given currency and exchange rate.
 
         :param curr (Currency): The currency to be converted.
         :param rate (float): The exchange rate for the currency conversion.
+        :param exact_rate (Optional[Decimal], optional): The exact exchange rate (as quoted). Defaults to None,
+        in which case it is derived from rate (the shortest decimal representation of the float).
         """
         self.__id = str(uuid.uuid4())
         self.__curr: Currency = curr
         self.__rate: float = rate
+        self.__exact_rate: Optional[Decimal] = exact_rate
         self.__created_at = datetime.now()
         self.__updated_at = datetime.now()
 
@@ -43,6 +42,13 @@ class Currency2RubRate:
     @rate.setter
     def rate(self, rate):
         self.__rate = rate
+        self.__exact_rate = None
+
+    @property
+    def exact_rate(self) -> Decimal:
+        if self.__exact_rate is None:
+            self.__exact_rate = Decimal(repr(self.__rate))
+        return self.__exact_rate
 
     @property
     def created_at(self):
@@ -0,0 +1,155 @@
+from __future__ import annotations
+from array import array
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable
+import struct
+import time
+from models.currency import Currency
+from models.currency_rate import Currency2RubRate
+from utilities.shared_snapshot import read_snapshot, write_snapshot
+
+
+# version, created (unix time), count, string table length; 24 bytes after the 16-byte file header keep the rates
+# column 8-byte aligned within the mapped file
+LAYOUT = struct.Struct("<QdII")
+
+
+class RatesSnapshot:
+    def __init__(self,
+                 version: int,
+                 created: float,
+                 rates: array | memoryview,
+                 codes: array | memoryview,
+                 offsets: array | memoryview,
+                 strings: bytes | memoryview,
+                 ):
+        """
+        Initialize the immutable set of the rates gathered at once. It is stored by columns: the rates in a float64
+        buffer, the currency codes in an int32 buffer and the names, symbols and exact rates in a string table
+        (UTF-8 blob sliced by offsets), so it is shared between processes as is (see write and load).
+
+        Use from_rates to build a snapshot. The Currency2RubRate objects are created on the first access only
+        (see currency_rate): the converter matches the currencies by the names and symbols columns.
+
+        :param version (int): The version of the snapshot, caches of anything derived from the rates key on it.
+        :param created (float): When the rates were gathered (unix time).
+        :param rates (array | memoryview): The rates (float64).
+        :param codes (array | memoryview): The currency codes (int32, 0 if unknown).
+        :param offsets (array | memoryview): The offsets of the strings (uint32): names, symbols, exact rates, the end.
+        :param strings (bytes | memoryview): The string table.
+        """
+        self.__version = version
+        self.__created = created
+        self.__rates = rates
+        self.__codes = codes
+        self.__offsets = offsets
+        self.__strings = strings
+        self.__objects: list[Currency2RubRate | None] = [None] * len(rates)
+
+    @classmethod
+    def from_rates(cls, rates: Iterable[Currency2RubRate], version: int,
+                   created: float | None = None) -> RatesSnapshot:
+        """
+        Builds the snapshot of the rates provided.
+
+        :param rates (Iterable[Currency2RubRate]): The rates.
+        :param version (int): The version of the snapshot.
+        :param created (float, optional): When the rates were gathered (unix time). Defaults to now.
+        """
+        rates = list(rates)
+        texts = ([r.curr.name for r in rates] + [r.curr.symbol for r in rates]
+                 + [str(r.exact_rate) for r in rates])
+        offsets = array("I", [0])
+        strings = bytearray()
+        for text in texts:
+            strings += text.encode()
+            offsets.append(len(strings))
+        return cls(version, time.time() if created is None else created, array("d", (r.rate for r in rates)),
+                   array("i", (r.curr.code or 0 for r in rates)), offsets, bytes(strings))
+
+    def __len__(self):
+        return len(self.__rates)
+
+    @property
+    def version(self) -> int:
+        return self.__version
+
+    @property
+    def created(self) -> datetime:
+        return datetime.fromtimestamp(self.__created)
+
+    def _text(self, n: int) -> str:
+        return bytes(self.__strings[self.__offsets[n]:self.__offsets[n + 1]]).decode()
+
+    def name(self, i: int) -> str:
+        return self._text(i)
+
+    def symbol(self, i: int) -> str:
+        return self._text(len(self) + i)
+
+    def rate(self, i: int) -> float:
+        return self.__rates[i]
+
+    def currency_rate(self, i: int) -> Currency2RubRate:
+        """
+        Returns the rate at the position as a Currency2RubRate object (created once per snapshot).
+        """
+        obj = self.__objects[i]
+        if obj is None:
+            code = self.__codes[i] or None
+            obj = Currency2RubRate(Currency(self.name(i), self.symbol(i), code), self.__rates[i],
+                                   exact_rate=Decimal(self._text(2 * len(self) + i)))
+            self.__objects[i] = obj
+        return obj
+
+    @property
+    def currency_rates(self) -> list[Currency2RubRate]:
+        return [self.currency_rate(i) for i in range(len(self))]
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the snapshot: the layout header followed by the rates, the codes, the offsets and the strings.
+        """
+        return b"".join((LAYOUT.pack(self.__version, self.__created, len(self), len(self.__strings)),
+                         bytes(self.__rates), bytes(self.__codes), bytes(self.__offsets), bytes(self.__strings)))
+
+    @classmethod
+    def from_buffer(cls, buffer: memoryview) -> RatesSnapshot:
+        """
+        Restores the snapshot serialized by to_bytes. The columns are not copied but refer to the buffer.
+
+        :raises ValueError: If the buffer is not a valid snapshot.
+        """
+        try:
+            version, created, count, strings_length = LAYOUT.unpack_from(buffer)
+        except struct.error as e:
+            raise ValueError(f"Rates snapshot is truncated: {e}") from None
+        position = LAYOUT.size
+        columns = []
+        for code, length in (("d", count), ("i", count), ("I", 3 * count + 1)):
+            size = array(code).itemsize * length
+            columns.append(buffer[position:position + size].cast(code))
+            position += size
+        strings = buffer[position:position + strings_length]
+        if len(strings) != strings_length or columns[2][-1] != strings_length:
+            raise ValueError(f"Rates snapshot is invalid: {count=}, {strings_length=}")
+        return cls(version, created, *columns, strings)
+
+    def write(self, path: str) -> None:
+        """
+        Writes the snapshot to the file to be shared with other processes or reloaded after a restart.
+        """
+        write_snapshot(path, self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str) -> RatesSnapshot:
+        """
+        Maps the snapshot file written by write (read-only, zero-copy).
+
+        :raises ValueError: If the file is not a valid snapshot.
+        """
+        return cls.from_buffer(read_snapshot(path))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(version={self.version}, {len(self)} rates)"
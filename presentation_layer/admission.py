@@ -0,0 +1,118 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Any
+
+from loguru import logger
+from telegram import Update
+from utilities.profiling import LoopLagMonitor
+
+
+class AdmissionController:
+    def __init__(self, max_pending: int = 200, max_lag: float = 0.25, stale_after: float = 5,
+                 recover_ratio: float = 0.5):
+        """
+        Initializes the controller of the load the bot takes: it counts the updates received but not processed yet
+        (queued or being processed) and watches the event loop lag.
+
+        The bot is overloaded once there are more than max_pending updates or the lag exceeds max_lag; it recovers
+        once both fall below recover_ratio of the limits (so the state does not flap). While overloaded, the handlers
+        degrade (see TelegramBot) and the inline queries which are stale or superseded by a newer query of the same
+        user are dropped. Every request shed is counted by the reason in shed.
+
+        Parameters:
+            max_pending (int): The number of the pending updates to be overloaded at. Defaults to 200.
+            max_lag (float): The event loop lag to be overloaded at, in seconds. Defaults to 0.25.
+            stale_after (float): How long an inline query may wait to be processed, in seconds. Defaults to 5.
+            recover_ratio (float): The share of the limits to recover at. Defaults to 0.5.
+        """
+        self.max_pending = max_pending
+        self.max_lag = max_lag
+        self.stale_after = stale_after
+        self.recover_ratio = recover_ratio
+        self.lag_monitor = LoopLagMonitor(threshold=max_lag)
+        self.received: dict[int, float] = {}
+        self.latest_inline: dict[int, str] = {}
+        self.admitted = 0
+        self.shed = Counter()
+        self.overloads = 0
+        self._overloaded = False
+
+    @property
+    def pending(self) -> int:
+        return len(self.received)
+
+    @property
+    def overloaded(self) -> bool:
+        """
+        Whether the bot is overloaded, the state is switched with hysteresis (see __init__).
+        """
+        lag = self.lag_monitor.last_lag
+        if not self._overloaded and (self.pending > self.max_pending or lag > self.max_lag):
+            self._overloaded = True
+            self.overloads += 1
+            logger.warning(f"Overloaded: {self.pending} updates pending, loop lag {lag * 1000:.0f} ms")
+        elif self._overloaded and (self.pending <= self.max_pending * self.recover_ratio
+                                   and lag <= self.max_lag * self.recover_ratio):
+            self._overloaded = False
+            logger.info(f"Recovered from overload, shed so far: {dict(self.shed)}")
+        return self._overloaded
+
+    def receive(self, update: Any) -> None:
+        """
+        Registers the update received (called by AdmissionQueue).
+        """
+        if not isinstance(update, Update):
+            return
+        self.received[update.update_id] = time.monotonic()
+        if update.inline_query:
+            self.latest_inline[update.inline_query.from_user.id] = update.inline_query.id
+
+    def admit(self, update: Any) -> bool:
+        """
+        Decides whether the update is to be processed. If it is, finish must be called once it is processed.
+        The inline queries which waited longer than stale_after are dropped; while overloaded, so are the ones
+        superseded by a newer query of the same user (their answers would not be shown anyway).
+        """
+        if not isinstance(update, Update):
+            return True
+        if update.inline_query:
+            waited = time.monotonic() - self.received.get(update.update_id, time.monotonic())
+            if waited > self.stale_after:
+                return self.drop(update, "inline_stale")
+            if self.overloaded and self.latest_inline.get(update.inline_query.from_user.id) != update.inline_query.id:
+                return self.drop(update, "inline_superseded")
+        self.admitted += 1
+        return True
+
+    def drop(self, update: Update, reason: str) -> bool:
+        self.finish(update)
+        self.shed[reason] += 1
+        return False
+
+    def finish(self, update: Any) -> None:
+        """
+        Registers the update processed (or dropped).
+        """
+        if not isinstance(update, Update):
+            return
+        self.received.pop(update.update_id, None)
+        if update.inline_query and self.latest_inline.get(update.inline_query.from_user.id) == update.inline_query.id:
+            del self.latest_inline[update.inline_query.from_user.id]
+
+    def stats(self) -> str:
+        return (f"{'overloaded' if self.overloaded else 'normal'}, {self.pending} updates pending, "
+                f"{self.admitted} admitted, shed: {dict(self.shed) or 'none'}, {self.overloads} overloads")
+
+
+class AdmissionQueue(asyncio.Queue):
+    """
+    The update queue of PTB which registers every update put with the admission controller.
+    """
+    def __init__(self, admission: AdmissionController):
+        super().__init__()
+        self.admission = admission
+
+    def _put(self, item: Any) -> None:
+        self.admission.receive(item)
+        super()._put(item)
@@ -0,0 +1,121 @@
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from telegram import InputTextMessageContent
+from utilities.decaying_counter import DecayingCounter
+from loguru import logger
+
+
+@dataclass(frozen=True)
+class PrerenderedArticle:
+    id: str
+    title: str
+    description: str
+    content: InputTextMessageContent
+    msg: str
+    query: str
+
+    @property
+    def size(self) -> int:
+        """
+        The approximate memory footprint of the article in bytes.
+        """
+        return 400 + 2 * (len(self.id) + len(self.title) + len(self.description) + 2 * len(self.msg) + len(self.query))
+
+
+@dataclass(frozen=True)
+class HotEntry:
+    articles: list[PrerenderedArticle]
+    next_offset: str
+
+    @property
+    def size(self) -> int:
+        return sum(article.size for article in self.articles)
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class HotQueries:
+    def __init__(self, size: int = 50, max_bytes: int = 1_000_000, half_life: float = 60*60):
+        """
+        Initializes the table of the precomputed answers to the most popular inline queries.
+
+        The popularity is learned from the queries sampled by the inline handler with a decaying counter; the
+        answers of the top queries are rendered by rebuild (after the rates refresh), so the matching queries are
+        answered without parsing.
+
+        Parameters:
+            size (int): The maximum number of the queries in the table. Defaults to 50.
+            max_bytes (int): The memory cap of the table (approximate). Defaults to 1_000_000.
+            half_life (float): The half-life of the popularity in seconds. Defaults to 1 hour.
+        """
+        self.size = size
+        self.max_bytes = max_bytes
+        self.counter = DecayingCounter(half_life)
+        self.table: dict[str, HotEntry] = {}
+        self.version = None
+        self.table_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def sample(self, query: str) -> str:
+        """
+        Counts the query and returns its normalized form.
+        """
+        key = normalize(query)
+        self.counter.add(key)
+        return key
+
+    def get(self, key: str, version: Any) -> HotEntry | None:
+        """
+        Returns the precomputed answer to the normalized query, if any, counting the hit ratio.
+        Nothing is returned if the table was rendered for another version of the rates.
+        """
+        entry = self.table.get(key) if version == self.version else None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def clear(self) -> int:
+        """
+        Drops the precomputed answers (the popularity counters are kept), returns the number of the answers dropped.
+        """
+        dropped = len(self.table)
+        self.table = {}
+        self.table_bytes = 0
+        return dropped
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    async def rebuild(self, render: Callable[[str], Awaitable[HotEntry | None]], version: Any) -> None:
+        """
+        Renders the answers to the top queries within the memory cap and replaces the table with them.
+
+        Parameters:
+            version (Any): The version of the rates the answers are rendered for.
+            render (Callable[[str], Awaitable[HotEntry | None]]): The coroutine function to render the first page of
+                the answer to the query, returns None if the query could not be answered.
+        """
+        table = {}
+        table_bytes = 0
+        for key in self.counter.top(self.size):
+            entry = await render(key)
+            if entry is None:
+                continue
+            if table_bytes + entry.size > self.max_bytes:
+                break
+            table[key] = entry
+            table_bytes += entry.size
+        logger.info(f"Hot queries table rebuilt: {len(table)} queries, ~{table_bytes} bytes, "
+                    f"hit ratio since the previous rebuild is {self.hit_ratio:.2f} ({self.hits} hits)")
+        self.table = table
+        self.version = version
+        self.table_bytes = table_bytes
+        self.hits = self.misses = 0
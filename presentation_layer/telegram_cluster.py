@@ -0,0 +1,228 @@
+import asyncio
+import multiprocessing
+import signal
+from multiprocessing import Queue
+from typing import Awaitable, Callable
+from uuid import uuid4
+
+from models.rates_snapshot import RatesSnapshot
+from presentation_layer.presentation import Ui
+from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.error import TelegramError
+from telegram.ext import CallbackDataCache
+from utilities.settings import get_settings
+from loguru import logger
+
+
+POLL_TIMEOUT = get_settings().poll_timeout
+REFRESH_INTERVAL = get_settings().refresh_interval
+ROUTED_PREFIX = "r"
+
+
+def partition_of(key: int, workers: int) -> int:
+    """
+    Returns the index of the worker owning the key (chat or user id).
+    """
+    return key % workers
+
+
+def routed_keyboard_uuid(chat_id: int) -> str:
+    """
+    Returns the uuid of a keyboard (32 characters as of PTB) which carries the chat id the keyboard was made for:
+    ROUTED_PREFIX, the chat id as 16 hex digits (two's complement), 15 random hex digits.
+    """
+    return f"{ROUTED_PREFIX}{chat_id & 0xFFFF_FFFF_FFFF_FFFF:016x}{uuid4().hex[:15]}"
+
+
+def routed_chat_id(callback_data: str) -> int | None:
+    """
+    Returns the chat id carried by the callback data of a button of a keyboard made by RoutedCallbackDataCache,
+    None for any other callback data.
+    """
+    if len(callback_data) < 32 or not callback_data.startswith(ROUTED_PREFIX):
+        return None
+    try:
+        key = int(callback_data[1:17], 16)
+    except ValueError:
+        return None
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def routing_key(update: Update) -> int:
+    """
+    Returns the key to route the update by: the chat id carried by the callback data if any (see
+    RoutedCallbackDataCache), the chat id if the update belongs to a chat, the user id otherwise.
+
+    Subscriptions are made for the same ids (chat id for chat messages, user id for inline queries), so the jobs and
+    the callback data of a chat are always kept by a single worker. The callback queries of the messages sent via
+    inline mode have no chat and may come from any user who sees the message, hence the chat id in the data.
+    """
+    if update.callback_query and isinstance(update.callback_query.data, str):
+        chat_id = routed_chat_id(update.callback_query.data)
+        if chat_id is not None:
+            return chat_id
+    if update.effective_chat:
+        return update.effective_chat.id
+    if update.effective_user:
+        return update.effective_user.id
+    return 0
+
+
+class RoutedCallbackDataCache(CallbackDataCache):
+    """
+    The cache of the arbitrary callback data of a worker: the uuid of a keyboard whose buttons carry a chat_id
+    (the subscription keyboards) is made by routed_keyboard_uuid, so the front routes the callback queries of its
+    buttons to the worker which keeps the data (see routing_key) whoever clicks them.
+    """
+    def process_keyboard(self, reply_markup: InlineKeyboardMarkup) -> InlineKeyboardMarkup:
+        markup = super().process_keyboard(reply_markup)
+        chat_id = next((button.callback_data["chat_id"] for row in reply_markup.inline_keyboard for button in row
+                        if isinstance(button.callback_data, dict) and "chat_id" in button.callback_data), None)
+        if markup is reply_markup or chat_id is None:
+            return markup
+        keyboard_uuid = next(button.callback_data[:32] for row in markup.inline_keyboard for button in row
+                             if button.callback_data)
+        keyboard_data = self._keyboard_data.pop(keyboard_uuid)
+        keyboard_data.keyboard_uuid = routed_keyboard_uuid(chat_id)
+        self._keyboard_data[keyboard_data.keyboard_uuid] = keyboard_data
+        return InlineKeyboardMarkup([
+            [
+                InlineKeyboardButton(button.text, callback_data=keyboard_data.keyboard_uuid + button.callback_data[32:])
+                if button.callback_data else button
+                for button in row
+            ]
+            for row in markup.inline_keyboard
+        ])
+
+
+class TelegramCluster(Ui):
+    def __init__(self, token: str, workers: int, worker_target: Callable[[int, Queue], None],
+                 refresher: Callable[[], Awaitable[None]] | None = None, snapshot_path: str | None = None):
+        """
+        Initialize the front of several bot worker processes: it polls the updates and distributes them between
+        the workers by chat id, and periodically runs the refresher (e.g. to publish the shared rates snapshot).
+
+        The chats are partitioned by the number of the workers: once it is changed, the stored jobs are to be moved
+        to their new owners before the workers are started (see PTBScheduler.repartition). The callback data of the
+        keyboards sent before stays in the persistence file of the former owner, so those buttons are answered as
+        invalid until the chat requests a new keyboard.
+
+        Parameters:
+            token (str): The token for the Telegram bot.
+            workers (int): The number of the worker processes.
+            worker_target (Callable[[int, Queue], None]): The picklable function to run in each worker process,
+                it receives the worker index and the queue of the updates (see TelegramBot.run_worker).
+            refresher (Callable[[], Awaitable[None]], optional): The coroutine function to be run before the workers
+                are started and then every REFRESH_INTERVAL seconds. Defaults to None.
+            snapshot_path (str, optional): The rates snapshot the refresher publishes. If the refresher fails
+                on start, the workers are started anyway as long as the snapshot is valid. Defaults to None.
+        """
+        if not token:
+            raise ValueError("Telegram token is not specified")
+        if workers < 1:
+            raise ValueError(f"Number of workers must be positive: {workers}")
+        self.__token = token
+        self.workers = workers
+        self.worker_target = worker_target
+        self.refresher = refresher
+        self.snapshot_path = snapshot_path
+        self.queues = []
+
+    def run(self) -> None:
+        """
+        A method to start the workers and to run the front until SIGINT or SIGTERM is received. Then every worker
+        is sent None to stop gracefully (see TelegramBot.run_worker) and is waited for.
+
+        :raises Exception: The error of the refresher on start if there is no valid snapshot at snapshot_path.
+        """
+        logger.info(f'Starting cluster of {self.workers} workers')
+        ctx = multiprocessing.get_context("spawn")
+        if self.refresher:
+            try:
+                asyncio.run(self.refresher())
+            except Exception as e:
+                snapshot = self.load_snapshot()
+                if snapshot is None:
+                    raise
+                logger.error(f"Refresh failed: {e}; the workers start with {snapshot} gathered at {snapshot.created}")
+        self.queues = [ctx.Queue() for _ in range(self.workers)]
+        processes = [ctx.Process(target=self.worker_target, args=(index, queue), name=f"worker-{index}")
+                     for index, queue in enumerate(self.queues)]
+        for process in processes:
+            process.start()
+        try:
+            asyncio.run(self._front())
+        finally:
+            for queue in self.queues:
+                queue.put(None)
+            for process in processes:
+                process.join()
+
+    def load_snapshot(self) -> RatesSnapshot | None:
+        """
+        Returns the snapshot at snapshot_path, None if there is no valid one.
+        """
+        if not self.snapshot_path:
+            return None
+        try:
+            return RatesSnapshot.load(self.snapshot_path)
+        except (FileNotFoundError, ValueError) as e:
+            logger.error(f"Rates snapshot '{self.snapshot_path}' is not usable: {e}")
+            return None
+
+    def dispatch(self, update: Update) -> None:
+        """
+        Puts the update to the queue of the worker owning it.
+        """
+        self.queues[partition_of(routing_key(update), self.workers)].put(update.to_dict())
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(REFRESH_INTERVAL)
+            try:
+                await self.refresher()
+            except Exception as e:
+                logger.error(f"Refresh failed: {e}")
+
+    async def _front(self) -> None:
+        """
+        Polls the updates and dispatches them to the workers until SIGINT or SIGTERM is received.
+        """
+        loop = asyncio.get_running_loop()
+        polling = asyncio.create_task(self._poll())
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, polling.cancel)
+        refresh_task = asyncio.create_task(self._refresh_periodically()) if self.refresher else None
+        try:
+            await polling
+        except asyncio.CancelledError:
+            logger.info('Stopping cluster')
+        finally:
+            if refresh_task:
+                refresh_task.cancel()
+
+    async def _poll(self) -> None:
+        """
+        Polls the updates and dispatches them. Once cancelled, the updates dispatched are confirmed to Telegram,
+        so they are not received again after a restart.
+        """
+        offset = None
+        async with Bot(self.__token) as bot:
+            try:
+                while True:
+                    try:
+                        updates = await bot.get_updates(offset=offset, timeout=POLL_TIMEOUT,
+                                                        allowed_updates=Update.ALL_TYPES)
+                    except TelegramError as e:
+                        logger.error(f"Failed to get updates: {e}")
+                        await asyncio.sleep(1)
+                        continue
+                    for update in updates:
+                        offset = update.update_id + 1
+                        self.dispatch(update)
+            finally:
+                if offset is not None:
+                    try:
+                        await bot.get_updates(offset=offset, timeout=0, limit=1)
+                    except TelegramError as e:
+                        logger.warning(f"Failed to confirm the updates dispatched: {e}")
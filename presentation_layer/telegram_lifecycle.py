@@ -0,0 +1,70 @@
+import asyncio
+from functools import wraps
+from typing import Any, Awaitable, Callable
+
+from loguru import logger
+from telegram.ext import Application
+
+
+class InFlight:
+    """
+    Tracks the running calls of the wrapped coroutine functions, so they could be waited for before the shutdown.
+    """
+    def __init__(self):
+        self.tasks: set[asyncio.Task] = set()
+
+    def track(self, callback: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        @wraps(callback)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            task = asyncio.current_task()
+            self.tasks.add(task)
+            try:
+                return await callback(*args, **kwargs)
+            finally:
+                self.tasks.discard(task)
+        return wrapper
+
+    async def drain(self, timeout: float) -> int:
+        """
+        Waits for the tracked calls to finish, the ones still running after timeout seconds are cancelled.
+
+        Returns:
+            int: The number of the calls cancelled.
+        """
+        if not self.tasks:
+            return 0
+        _, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        return len(pending)
+
+
+class DrainingApplication(Application):
+    def __init__(self, *, in_flight: InFlight, drain_timeout: float, **kwargs: Any):
+        """
+        The application of PTB which lets the in-flight jobs (the notifications being sent) finish before stopping.
+        PTB itself waits for the running jobs without a deadline, so a stuck send would block a redeploy.
+
+        Parameters:
+            in_flight (InFlight): The tracker of the job callbacks.
+            drain_timeout (float): How long to wait for the running jobs on stop, in seconds.
+        """
+        super().__init__(**kwargs)
+        self.in_flight = in_flight
+        self.drain_timeout = drain_timeout
+        self.cancelled_on_stop = 0
+
+    async def stop(self) -> None:
+        """
+        Pauses the job queue (no new jobs are started), drains the running jobs and stops the application.
+        The number of the jobs cancelled is kept in cancelled_on_stop.
+        """
+        if self.running and self.job_queue and self.job_queue.scheduler.running:
+            self.job_queue.scheduler.pause()
+            running = len(self.in_flight.tasks)
+            cancelled = self.cancelled_on_stop = await self.in_flight.drain(self.drain_timeout)
+            if cancelled:
+                logger.warning(f"{cancelled} of {running} running jobs are cancelled after {self.drain_timeout} s")
+            else:
+                logger.info(f"{running} running jobs are finished")
+        await super().stop()
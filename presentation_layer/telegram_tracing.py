@@ -0,0 +1,57 @@
+from typing import Any, Awaitable, TYPE_CHECKING
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from telegram.request import HTTPXRequest
+from utilities.tracing import Tracer, span
+
+if TYPE_CHECKING:
+    from presentation_layer.admission import AdmissionController
+
+
+class TracingUpdateProcessor(BaseUpdateProcessor):
+    def __init__(self, tracer: Tracer, max_concurrent_updates: int = 1,
+                 admission: "AdmissionController | None" = None):
+        """
+        The update processor of PTB which starts a new trace for every update, so the spans of the handlers
+        and of the Telegram API calls made while processing it belong to the trace.
+
+        Parameters:
+            tracer (Tracer): The tracer to start the traces with.
+            max_concurrent_updates (int): The number of updates processed concurrently. Defaults to 1
+                (as PTB does by default).
+            admission (AdmissionController, optional): The controller to decide whether the update is processed
+                at all. Defaults to None (every update is processed).
+        """
+        super().__init__(max_concurrent_updates)
+        self.tracer = tracer
+        self.admission = admission
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        if self.admission and not self.admission.admit(update):
+            coroutine.close()
+            return
+        kind = "unknown"
+        if isinstance(update, Update):
+            kind = next((kind for kind in Update.ALL_TYPES if getattr(update, kind, None) is not None), kind)
+        try:
+            with self.tracer.trace(f"update {kind}", update_id=getattr(update, "update_id", 0)):
+                await coroutine
+        finally:
+            if self.admission:
+                self.admission.finish(update)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+
+class TracingRequest(HTTPXRequest):
+    """
+    The request of PTB which records a span for every Telegram API call made within a trace.
+    """
+    async def do_request(self, url: str, method: str, *args: Any, **kwargs: Any) -> tuple[int, bytes]:
+        with span(f"telegram {url.rsplit('/', 1)[-1]}"):
+            return await super().do_request(url, method, *args, **kwargs)
@@ -1,26 +1,73 @@
-import os
+import asyncio
+import signal
+import threading
+import time
 
 from business_layer.converter import Converter
+from business_layer.currency_updater import CurrencyUpdaterSnapshot
 from business_layer.scheduler import Scheduler
 from models.converted_query import ConvertedQuery
 from presentation_layer.presentation import Ui
+from presentation_layer.hot_queries import HotEntry, HotQueries, PrerenderedArticle
+from utilities.settings import get_settings
+from utilities.executors import get_executors
+from utilities.pickle_persistence import DirtyPicklePersistence
+from utilities.profiling import LoopLagMonitor, SamplingProfiler, detect_slow
+from utilities.tracing import get_tracer, span, traced
+from presentation_layer.telegram_tracing import TracingRequest, TracingUpdateProcessor
+from presentation_layer.telegram_lifecycle import DrainingApplication, InFlight
+from presentation_layer.admission import AdmissionController, AdmissionQueue
+from presentation_layer.telegram_cluster import RoutedCallbackDataCache
 from functools import wraps
+from multiprocessing import Queue
 from uuid import uuid4
 from datetime import datetime, timedelta
 from telegram import (Update, InlineQueryResultArticle, InputTextMessageContent,
                       InlineKeyboardMarkup, InlineKeyboardButton)
 from telegram.ext import (Application, CommandHandler, ContextTypes, InlineQueryHandler, CallbackQueryHandler,
-                          PicklePersistence, MessageHandler, filters)
-import sys
+                          ChosenInlineResultHandler, MessageHandler, filters)
 from loguru import logger
 
 
-logger.remove()
-logger.add(sys.stdout, level="TRACE", format="<green>{time}</green> | <blue>{module}</blue> | <lvl>{level}</lvl> | "
-                                             "{message}", serialize=False)
-PERSISTENCE_FILE = os.getenv("PERSISTENCE_FILE")
-HELP_MESSAGE = os.getenv("HELP_MSG")
-START_MESSAGE = os.getenv("START_MSG", "Hello!")
+PERSISTENCE_FILE = get_settings().persistence_file
+PERSISTENCE_INTERVAL = get_settings().persistence_interval
+SHUTDOWN_TIMEOUT = get_settings().shutdown_timeout
+HELP_MESSAGE = get_settings().help_msg
+START_MESSAGE = get_settings().start_msg
+INLINE_PAGE_SIZE = get_settings().inline_page_size
+BOT_API_URL = get_settings().bot_api_url
+ADMIN_IDS = get_settings().admin_ids
+PROFILING = get_settings().profiling
+SLOW_HANDLER_MS = get_settings().slow_handler_ms
+LOOP_LAG_MS = get_settings().loop_lag_ms
+PROFILE_SECONDS = get_settings().profile_seconds
+PROFILE_DIR = get_settings().profile_dir
+TRACE_SAMPLE_RATE = get_settings().trace_sample_rate
+HOT_QUERIES_SIZE = get_settings().hot_queries_size
+HOT_QUERIES_MAX_BYTES = get_settings().hot_queries_max_bytes
+HOT_QUERIES_HALF_LIFE = get_settings().hot_queries_half_life
+HOT_QUERIES_INTERVAL = get_settings().hot_queries_interval
+EXACT_ENDPOINTS = get_settings().exact_endpoints
+ADMISSION_MAX_PENDING = get_settings().admission_max_pending
+ADMISSION_MAX_LAG_MS = get_settings().admission_max_lag_ms
+INLINE_STALE_MS = get_settings().inline_stale_ms
+
+
+def reduce_freq(func):
+    """
+    A decorator to limit the frequency of the calls of the handler (a method of TelegramBot): the calls made by
+    the same user within 2 seconds after the previous one are ignored. The name of the handler is preserved
+    (e.g. for detect_slow).
+    :param func: The coroutine method handling an update
+    """
+    @wraps(func)
+    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if context.user_data.get("last_call", datetime.now() - timedelta(days=1)) > datetime.now() - timedelta(seconds=2):
+            logger.warning(f"Too many calls from {update.effective_user.username}")
+            return
+        context.user_data["last_call"] = datetime.now()
+        return await func(self, update, context)
+    return wrapper
 
 
 class TelegramBot(Ui):
@@ -49,21 +96,19 @@ class TelegramBot(Ui):
         self.callback_cmds = {}
         if self.scheduler:
             self.callback_cmds.update(self.scheduler.cmds)
-
-    @wraps
-    async def reduce_freq(self, func):
-        """
-        A decorator to limit the number of calls to the given function.
-        :param update: An update object from PTB
-        :param context: A context object from PTB
-        """
-        def wrapper(update: Update, context: ContextTypes.DEFAULT_TYPE):
-            if context.user_data.get("last_call", datetime.now() - timedelta(days=1)) > datetime.now() - timedelta(seconds=2):
-                logger.warning(f"Too many calls from {update.effective_user.username}")
-                return
-            context.user_data["last_call"] = datetime.now()
-            return func(update, context)
-        return wrapper
+        self.lag_monitor = LoopLagMonitor(threshold=LOOP_LAG_MS / 1000) if PROFILING else None
+        self.profiler = SamplingProfiler(PROFILE_DIR)
+        self.background_tasks = set()
+        self.in_flight = InFlight()
+        self.started_at = datetime.now()
+        self.admission = None
+        if ADMISSION_MAX_PENDING > 0:
+            self.admission = AdmissionController(ADMISSION_MAX_PENDING, ADMISSION_MAX_LAG_MS / 1000,
+                                                 INLINE_STALE_MS / 1000)
+        self.hot_queries = None
+        if HOT_QUERIES_SIZE > 0:
+            self.hot_queries = HotQueries(HOT_QUERIES_SIZE, HOT_QUERIES_MAX_BYTES, HOT_QUERIES_HALF_LIFE)
+            self.__converter.update_listeners.append(self.on_rates_update)
 
     async def populate_callback_cmds(self, cmd: str, func: callable):
         """
@@ -133,7 +178,7 @@ class TelegramBot(Ui):
             return
         logger.trace(f"{query=}")
         try:
-            conv_queries = await self.__converter.parse_request(query)
+            conv_queries = await self.__converter.parse_request(query, exact="chat" in EXACT_ENDPOINTS)
         except ValueError as e:
             logger.error(f"Caught error: {e}")
             await update.message.reply_text("""Неверное выражение, попробуйте написать по-другому.
@@ -141,8 +186,12 @@ class TelegramBot(Ui):
             return
         logger.trace(f"{conv_queries=}")
         conv_query = conv_queries[0]
+        self.__converter.register_usage(conv_query.curr_rate.curr.symbol)
         msg = self.converted_query_to_msg(conv_query)
-        if self.scheduler:
+        if self.scheduler and self.overloaded:
+            self.admission.shed["chat_keyboard"] += 1
+            reply_markup = None
+        elif self.scheduler:
             reply_markup = self.scheduler.create_inline_keyboard_sub(data_for_scheduler=conv_query.query, answer=msg,
                                                                      chat_id=update.message.chat_id)
         else:
@@ -187,35 +236,154 @@ class TelegramBot(Ui):
         A function to handle all inline queries from the Telegram bot.
         Utilizes reduce_freq decorator to limit the number of calls to the given function.
 
+        Results are ranked by the converter and answered by pages of INLINE_PAGE_SIZE items, the next page is
+        requested by Telegram with the next_offset provided, so only the requested page is built. The next_offset
+        carries the version of the rates the ranking belongs to (see Converter.install), so the pages of a query
+        are never mixed from two orderings: once the rates are updated, the pagination of the query ends.
+        The first pages of the popular queries are answered from the precomputed table (see HotQueries).
+        While the bot is overloaded (see AdmissionController), only those are answered and without the keyboards.
+
         :param update: An update object from PTB
         :param context: A context object from PTB
         """
         query = update.inline_query.query
         if not query:
             return
-        results = []
-        logger.trace(f"{query=}")
         try:
-            conv_queries = await self.__converter.parse_request(query)
-        except ValueError as e:
-            logger.error(f"Caught error: {e}")
+            version, offset = self.parse_offset(update.inline_query.offset)
+        except ValueError:
+            logger.warning(f"Invalid offset: '{update.inline_query.offset}'")
+            version, offset = None, 0
+        logger.trace(f"{query=}, {offset=}, {version=}")
+        entry = None
+        if offset == 0 and self.hot_queries:
+            await self.__converter.refresh_if_outdated()
+            entry = self.hot_queries.get(self.hot_queries.sample(query), self.__converter.version)
+        elif version is not None and version != self.__converter.version:
+            logger.trace(f"Rates are updated since the first page of '{query}', its pagination is ended")
+            await update.inline_query.answer([], next_offset="")
+            return
+        overloaded = self.overloaded
+        if entry is None and overloaded:
+            self.admission.shed["inline_uncached"] += 1
             return
+        if entry is None:
+            try:
+                entry = await self.render_inline_page(query, offset)
+            except ValueError as e:
+                logger.error(f"Caught error: {e}")
+                return
+        if overloaded and self.scheduler:
+            self.admission.shed["inline_keyboard"] += 1
+        results = self.inline_page_to_results(entry, update.inline_query.from_user.id, keyboards=not overloaded)
+        await update.inline_query.answer(results, next_offset=entry.next_offset)
+
+    @property
+    def overloaded(self) -> bool:
+        return self.admission is not None and self.admission.overloaded
+
+    @staticmethod
+    def parse_offset(offset: str) -> tuple[int | None, int]:
+        """
+        Parses the offset of the inline query made by render_inline_page: '<version>:<offset>'
+        (a bare offset is accepted as well and is not bound to a version).
+
+        :param offset: The offset of the inline query, empty for the first page
+        :return: The version of the rates and the number of the ranked results to skip
+        :raises ValueError: If the offset is malformed
+        """
+        if not offset:
+            return None, 0
+        version, _, skip = offset.rpartition(":")
+        return (int(version) if version else None), int(skip)
+
+    async def render_inline_page(self, query: str, offset: int) -> HotEntry:
+        """
+        A function to render the page of the answer to the inline query, everything except the keyboards which
+        depend on the user.
+
+        :param query: The inline query
+        :param offset: The number of the ranked results to skip
+        :return: The rendered page along with the offset of the next one (see parse_offset)
+        :raises ValueError: If the query could not be parsed
+        """
+        conv_queries = await self.__converter.parse_request(query, offset=offset, limit=INLINE_PAGE_SIZE + 1,
+                                                            exact="inline" in EXACT_ENDPOINTS)
         logger.trace(f"{conv_queries=}")
-        for conv_query in conv_queries:
+        articles = []
+        for conv_query in conv_queries[:INLINE_PAGE_SIZE]:
             msg = self.converted_query_to_msg(conv_query)
-            if self.scheduler:
-                reply_markup = self.scheduler.create_inline_keyboard_sub(data_for_scheduler=conv_query.query, answer=msg,
-                                                                         chat_id=update.inline_query.from_user.id)
-            else:
-                reply_markup = None
-            results.append(InlineQueryResultArticle(
-                id=str(uuid4()),
+            articles.append(PrerenderedArticle(
+                id=f"{conv_query.curr_rate.curr.symbol}:{uuid4().hex}",
                 title=conv_query.curr_rate.curr.name,
                 description=self.converted_query_to_desc(conv_query),
-                input_message_content=InputTextMessageContent(msg),
-                reply_markup=reply_markup,
+                content=InputTextMessageContent(msg),
+                msg=msg,
+                query=conv_query.query,
             ))
-        await update.inline_query.answer(results)
+        next_offset = (f"{self.__converter.version}:{offset + INLINE_PAGE_SIZE}"
+                       if len(conv_queries) > INLINE_PAGE_SIZE else "")
+        return HotEntry(articles, next_offset)
+
+    def inline_page_to_results(self, entry: HotEntry, chat_id: int,
+                               keyboards: bool = True) -> list[InlineQueryResultArticle]:
+        """
+        A function to compile the inline query results of the rendered page, adding the subscription keyboards.
+
+        :param entry: The rendered page
+        :param chat_id: The id of the chat to subscribe to the updates (the user who sent the inline query)
+        :param keyboards: Whether to add the subscription keyboards
+        :return: The inline query results
+        """
+        with span("build_results", count=len(entry.articles)):
+            return [InlineQueryResultArticle(
+                id=article.id,
+                title=article.title,
+                description=article.description,
+                input_message_content=article.content,
+                reply_markup=self.scheduler.create_inline_keyboard_sub(data_for_scheduler=article.query,
+                                                                       answer=article.msg,
+                                                                       chat_id=chat_id)
+                if self.scheduler and keyboards else None,
+            ) for article in entry.articles]
+
+    async def render_hot_query(self, query: str) -> HotEntry | None:
+        try:
+            return await self.render_inline_page(query, 0)
+        except ValueError:
+            return None
+
+    async def rebuild_hot_queries(self) -> None:
+        """
+        Rebuilds the table of the precomputed answers to the popular inline queries.
+        """
+        if self.hot_queries:
+            await self.hot_queries.rebuild(self.render_hot_query, self.__converter.version)
+
+    async def rebuild_hot_queries_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(HOT_QUERIES_INTERVAL)
+            await self.rebuild_hot_queries()
+
+    def on_rates_update(self) -> None:
+        """
+        A function called by the converter once the rates are updated: the precomputed answers are rebuilt.
+        """
+        if self.app and self.app.running:
+            self.app.create_task(self.rebuild_hot_queries())
+
+    async def chosen_inline_result_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        A function to handle the inline results chosen by users. It registers the usage of the chosen currency,
+        so the popular currencies are ranked higher in the inline results.
+        Requires inline feedback to be enabled for the bot via @BotFather.
+
+        :param update: An update object from PTB
+        :param context: A context object from PTB
+        """
+        symbol, _, _ = update.chosen_inline_result.result_id.partition(":")
+        logger.trace(f"chosen: {symbol=}")
+        self.__converter.register_usage(symbol)
 
     async def notify(self, context: ContextTypes.DEFAULT_TYPE) -> None:
         """
@@ -229,7 +397,7 @@ class TelegramBot(Ui):
         logger.trace(f"notify: {query=}")
         logger.trace(f"{context.job.chat_id}")
         try:
-            conv_queries = await self.__converter.parse_request(query)
+            conv_queries = await self.__converter.parse_request(query, exact="notify" in EXACT_ENDPOINTS)
         except ValueError as e:
             logger.error(f"Caught error: {e}")
             return
@@ -241,20 +409,235 @@ class TelegramBot(Ui):
                                        text=self.converted_query_to_msg(conv_query),
                                        reply_markup=reply_markup)
 
-    def run(self):
+    @staticmethod
+    def describe_call(args: tuple) -> str:
         """
-        A method to run the bot, setting up various handlers for commands, messages, and errors.
+        Describes the call of a handler or a job callback by the type of the update for the profiling logs.
         """
-        logger.info('Starting bot')
-        persistence = PicklePersistence(filepath=PERSISTENCE_FILE)
-        self.app = (Application.builder()
-               .token(self.__token)
-               .persistence(persistence)
-               .arbitrary_callback_data(True)
-               .build())
+        update = args[0] if args else None
+        if isinstance(update, Update):
+            return next((kind for kind in Update.ALL_TYPES if getattr(update, kind, None) is not None), "update")
+        return "job"
+
+    async def capture_profile(self) -> str:
+        """
+        Captures the sampling profile of the event loop thread for PROFILE_SECONDS.
+
+        Returns:
+            str: The path of the profile written.
+        """
+        return await asyncio.to_thread(self.profiler.capture, threading.get_ident(), PROFILE_SECONDS)
+
+    async def debug_profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        A function to handle the debug_profile command (available to ADMIN_IDS only). It captures the sampling
+        profile of the bot and replies with the path of the profile file.
+
+        :param update: An update object from PTB
+        :param context: A context object from PTB
+        """
+        if self.profiler.busy:
+            await update.message.reply_text("Profile capture is already in progress")
+            return
+        await update.message.reply_text(f"Capturing profile for {PROFILE_SECONDS} s")
+        path = await self.capture_profile()
+        await update.message.reply_text(f"Profile is written to {path}")
+
+    async def stats_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        A function to handle the stats command (available to ADMIN_IDS only). It replies with the age of the rates,
+        the sizes of the caches and the depth of the queues, all of them are taken from the counters kept anyway.
+
+        :param update: An update object from PTB
+        :param context: A context object from PTB
+        """
+        converter = self.__converter
+        now = datetime.now()
+        lines = [f"Uptime: {now - self.started_at}"]
+        if converter.update_dt is None:
+            lines.append("Rates: not gathered yet")
+        else:
+            lines.append(f"Rates: version {converter.version}, {len(converter.snapshot)} currencies, "
+                         f"gathered at {converter.update_dt:%Y-%m-%d %H:%M:%S} ({now - converter.update_dt} ago) "
+                         f"by {type(converter.updater).__name__}{', refreshing' if converter.refreshing else ''}")
+        lines.append(f"Fuzzy index: {len(converter.fuzzy_index.terms)} terms, {len(converter.fuzzy_index.deletes)} "
+                     f"deletes; popularity: {len(converter.popularity)} currencies")
+        if self.hot_queries:
+            lines.append(f"Hot queries: {len(self.hot_queries.table)} answers, ~{self.hot_queries.table_bytes} bytes, "
+                         f"hit ratio {self.hot_queries.hit_ratio:.2f}, {len(self.hot_queries.counter)} queries counted")
+        lines.append(f"Queues: {context.application.update_queue.qsize()} updates queued, "
+                     f"{context.application.update_processor.current_concurrent_updates} being processed, "
+                     f"{len(self.in_flight.tasks)} notifications being sent")
+        if self.admission:
+            lines.append(f"Admission: {self.admission.stats()}")
+        if self.lag_monitor:
+            lines.append(f"Loop lag: {self.lag_monitor.last_lag * 1000:.1f} ms, "
+                         f"max {self.lag_monitor.max_lag * 1000:.1f} ms, {self.lag_monitor.stalls} stalls")
+        await update.message.reply_text("\n".join(lines))
+
+    async def refresh_rates_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        A function to handle the refresh_rates command (available to ADMIN_IDS only). It updates the rates right away,
+        joining the update in progress if any (so repeated commands do not multiply the requests for the rates).
+        A worker of TelegramCluster only reloads the snapshot shared by the front (the front gathers the rates every
+        REFRESH_INTERVAL seconds), the reply says so.
+
+        :param update: An update object from PTB
+        :param context: A context object from PTB
+        """
+        started = time.perf_counter()
+        try:
+            await self.__converter.refresh()
+        except Exception as e:
+            logger.error(f"Rates refresh requested by {update.effective_user.id} failed: {e}")
+            await update.message.reply_text(f"Rates refresh failed: {e}")
+            return
+        action = ("Rates snapshot is reloaded (the rates are gathered by the front of the cluster only)"
+                  if isinstance(self.__converter.updater, CurrencyUpdaterSnapshot) else "Rates are refreshed")
+        await update.message.reply_text(f"{action} in {time.perf_counter() - started:.2f} s: "
+                                        f"version {self.__converter.version}, "
+                                        f"{len(self.__converter.snapshot)} currencies, "
+                                        f"gathered at {self.__converter.update_dt:%Y-%m-%d %H:%M:%S}")
+
+    async def jobs_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        A function to handle the jobs command (available to ADMIN_IDS only). It replies with the numbers of the
+        subscriptions per plan and the nearest run of the notifications (see Scheduler.stats).
+
+        :param update: An update object from PTB
+        :param context: A context object from PTB
+        """
+        stats = await self.scheduler.stats() if self.scheduler else {}
+        if not stats:
+            await update.message.reply_text("Scheduler is not enabled")
+            return
+        lines = [f"{plan}: {counts['active']} (+{counts['subscribed']} / -{counts['unsubscribed']} since the start)"
+                 for plan, counts in stats["plans"].items()]
+        lines.insert(0, "Subscriptions:")
+        lines.append(f"Next run: {stats['next_run'] or 'none'}")
+        await update.message.reply_text("\n".join(lines))
+
+    async def cache_clear_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        A function to handle the cache_clear command (available to ADMIN_IDS only). It drops the precomputed answers
+        to the hot queries, so they are rendered from the current rates on the next rebuild.
 
+        :param update: An update object from PTB
+        :param context: A context object from PTB
+        """
+        if not self.hot_queries:
+            await update.message.reply_text("Hot queries are not enabled")
+            return
+        dropped = self.hot_queries.clear()
+        logger.info(f"Hot queries table is cleared by {update.effective_user.id}: {dropped} answers")
+        await update.message.reply_text(f"{dropped} precomputed answers are dropped")
+        context.application.create_task(self.rebuild_hot_queries())
+
+    async def flush_persistence_periodically(self, app: Application) -> None:
+        while True:
+            await asyncio.sleep(PERSISTENCE_INTERVAL)
+            try:
+                await app.persistence.flush()
+            except Exception as e:  # the data stays dirty, so the next flush retries
+                logger.error(f"Persistence flush failed: {e}")
+
+    async def post_init(self, app: Application) -> None:
+        """
+        A function called by PTB once the application is initialized. It warms the caches up (the rates, the fuzzy
+        index and the precomputed answers), so the first requests are not slower than the rest, and starts the periodic
+        rebuild of the precomputed answers and the periodic flush of the persistence (so the flush on shutdown has
+        little to write). If PROFILING is enabled, it also starts the event loop lag monitor and lets SIGUSR1 capture
+        the sampling profile.
+        """
+        try:
+            await self.__converter.refresh_if_outdated()
+        except Exception as e:
+            logger.error(f"Rates are not gathered on start: {e}")
+        if self.hot_queries:
+            await self.rebuild_hot_queries()
+            self.background_tasks.add(asyncio.create_task(self.rebuild_hot_queries_periodically()))
+        if app.persistence:
+            self.background_tasks.add(asyncio.create_task(self.flush_persistence_periodically(app)))
+        if self.admission:
+            self.admission.lag_monitor.start()
+        if self.lag_monitor:
+            self.lag_monitor.start()
+            asyncio.get_running_loop().add_signal_handler(
+                signal.SIGUSR1, lambda: app.create_task(self.capture_profile()))
+
+    async def post_stop(self, app: Application) -> None:
+        """
+        A function called by PTB once the application is stopped (the running jobs are drained by then, see
+        DrainingApplication). It stops the background tasks and lets the update of the rates in progress finish
+        within SHUTDOWN_TIMEOUT, before PTB flushes the persistence.
+        """
+        for task in self.background_tasks:
+            task.cancel()
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
+        self.background_tasks.clear()
+        if self.lag_monitor:
+            self.lag_monitor.stop()
+        if self.admission:
+            self.admission.lag_monitor.stop()
+        await self.__converter.close(SHUTDOWN_TIMEOUT)
+
+    async def post_shutdown(self, app: Application) -> None:
+        """
+        A function called by PTB once the application is shut down: the executors are shut down and the traces
+        buffered are exported.
+        """
+        await asyncio.to_thread(get_executors().shutdown)
+        await asyncio.to_thread(get_tracer().exporter.shutdown, SHUTDOWN_TIMEOUT)
+        logger.info("Bot is shut down")
+
+    def build_app(self, persistence_file: str = PERSISTENCE_FILE, polling: bool = True) -> Application:
+        """
+        A method to build the PTB application, setting up various handlers for commands, messages, and errors.
+        If PROFILING is enabled, the handlers and the notifications log the calls slower than SLOW_HANDLER_MS.
+        Every update and notification is processed within a trace (see utilities.tracing), TRACE_SAMPLE_RATE of them
+        are recorded along with the Telegram API calls made.
+        On stop, the notifications being sent are given SHUTDOWN_TIMEOUT to finish (see post_stop).
+        If ADMISSION_MAX_PENDING > 0, the updates pass the admission controller which sheds the load on bursts.
+
+        Parameters:
+            persistence_file (str): The file to keep the persistent data in.
+            polling (bool): Whether the application gets updates by itself. Defaults to True. If not, it is a worker
+                of TelegramCluster and its keyboards carry the chat they are made for (see RoutedCallbackDataCache).
+
+        Returns:
+            Application: The application built.
+        """
+        persistence = DirtyPicklePersistence(persistence_file, update_interval=PERSISTENCE_INTERVAL)
+        builder = (Application.builder()
+                   .application_class(DrainingApplication,
+                                      kwargs={"in_flight": self.in_flight, "drain_timeout": SHUTDOWN_TIMEOUT})
+                   .token(self.__token)
+                   .persistence(persistence)
+                   .arbitrary_callback_data(True)
+                   .concurrent_updates(TracingUpdateProcessor(get_tracer(), admission=self.admission))
+                   .post_init(self.post_init)
+                   .post_stop(self.post_stop)
+                   .post_shutdown(self.post_shutdown))
+        if self.admission:
+            builder = builder.update_queue(AdmissionQueue(self.admission))
+        if TRACE_SAMPLE_RATE > 0:
+            builder = builder.request(TracingRequest(connection_pool_size=256))
+        if BOT_API_URL:
+            builder = builder.base_url(f"{BOT_API_URL}/bot").base_file_url(f"{BOT_API_URL}/file/bot")
+        if not polling:
+            builder = builder.updater(None)
+        self.app = builder.build()
+        if not polling:
+            with self.app.bot._unfrozen():  # PTB has no builder option for the callback data cache class
+                self.app.bot._callback_data_cache = RoutedCallbackDataCache(
+                    self.app.bot, self.app.bot.callback_data_cache.maxsize)
+
+        notify = traced(get_tracer(), "job notify", self.notify)
+        if PROFILING:
+            notify = detect_slow(notify, SLOW_HANDLER_MS / 1000, self.describe_call)
+        notify = self.in_flight.track(notify)
         if self.scheduler:
-            self.scheduler.adjust_tg(self.app, self.notify)
+            self.scheduler.adjust_tg(self.app, notify)
 
         # Commands
         self.app.add_handler(CommandHandler('start', self.start_command))
@@ -264,9 +647,64 @@ class TelegramBot(Ui):
 
         # InlineQuery
         self.app.add_handler(InlineQueryHandler(self.inline_query_handler))
+        self.app.add_handler(ChosenInlineResultHandler(self.chosen_inline_result_handler))
+
+        # Admin
+        if ADMIN_IDS:
+            admins = filters.User(user_id=ADMIN_IDS)
+            self.app.add_handler(CommandHandler('debug_profile', self.debug_profile_command, filters=admins))
+            self.app.add_handler(CommandHandler('stats', self.stats_command, filters=admins))
+            self.app.add_handler(CommandHandler('refresh_rates', self.refresh_rates_command, filters=admins))
+            self.app.add_handler(CommandHandler('jobs', self.jobs_command, filters=admins))
+            self.app.add_handler(CommandHandler('cache_clear', self.cache_clear_command, filters=admins))
+
+        # Profiling
+        if PROFILING:
+            for handlers in self.app.handlers.values():
+                for handler in handlers:
+                    handler.callback = detect_slow(handler.callback, SLOW_HANDLER_MS / 1000, self.describe_call)
 
         # Errors
         # app.add_error_handler(error)
+        return self.app
 
+    def run(self):
+        """
+        A method to run the bot polling for updates.
+        """
+        logger.info('Starting bot')
+        self.build_app()
         logger.info('Start polling')
-        self.app.run_polling(poll_interval=2, allowed_updates=Update.ALL_TYPES)
\ No newline at end of file
+        self.app.run_polling(poll_interval=2, allowed_updates=Update.ALL_TYPES)
+
+    def run_worker(self, updates: Queue, persistence_file: str) -> None:
+        """
+        A method to run the bot as a worker process of TelegramCluster: the updates are not polled, but received
+        from the queue (as dicts) until None is received. SIGINT (e.g. Ctrl+C sent to the whole process group) is
+        ignored, the front stops the worker by None once the updates it dispatched are queued.
+
+        Parameters:
+            updates (Queue): The queue to receive the updates from.
+            persistence_file (str): The file to keep the persistent data of the worker in.
+        """
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        logger.info(f'Starting worker, {persistence_file=}')
+        self.build_app(persistence_file, polling=False)
+        asyncio.run(self._process_queue(updates))
+
+    async def _process_queue(self, updates: Queue) -> None:
+        """
+        Feeds the updates received from the queue to the application. The cached callback data is inserted into
+        them the way the bot does it for the updates it gets by itself.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.app:
+            await self.app.start()
+            await self.post_init(self.app)
+            while (data := await loop.run_in_executor(None, updates.get)) is not None:
+                update = Update.de_json(data, self.app.bot)
+                self.app.bot.insert_callback_data(update)
+                await self.app.update_queue.put(update)
+            await self.app.stop()
+            await self.post_stop(self.app)
+        await self.post_shutdown(self.app)
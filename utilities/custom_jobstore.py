@@ -1,17 +1,13 @@
+import pickle
 from loguru import logger
-import sys
-from typing import Any
+from typing import Any, Callable
 from apscheduler.job import Job as APSJob
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from sqlalchemy import create_engine, inspect, select
 from utilities.ptbjobstate_adapter import PTBJobStateAdapter
 from telegram.ext import Application
 
 
-logger.remove()
-logger.add(sys.stdout, level="TRACE", format="<green>{time}</green> | <blue>{module}</blue> | <lvl>{level}</lvl> | {message}",
-           serialize=False)
-
-
 class PTBJobStore(PTBJobStateAdapter, SQLAlchemyJobStore):
     def __init__(self, application: Application, **kwargs: Any) -> None:
         """
@@ -57,4 +53,42 @@ class PTBJobStore(PTBJobStateAdapter, SQLAlchemyJobStore):
             job_state (bytes): The state of the job to be reconstituted.
         """
         job: APSJob = super()._reconstitute_job(job_state)  # pylint: disable=W0212
-        return super()._restore_ptbjob(job)
\ No newline at end of file
+        return super()._restore_ptbjob(job)
+
+
+def repartition(url: str, prefix: str, owner: Callable[[int], str], tablenames: list[str]) -> int:
+    """
+    Moves the jobs kept by PTBJobStore in the tables whose names start with prefix to the tables of their owners,
+    in a single transaction. The jobs are not restored (no application is needed): the chat id is read from the
+    job state as stored by PTBJobStateAdapter._make_serializable.
+
+    Parameters:
+        url (str): The URL of the database.
+        prefix (str): The prefix of the names of the tables to move the jobs from.
+        owner (Callable[[int], str]): The function returning the name of the table of the chat id.
+        tablenames (list[str]): The names of the tables to move the jobs to, they are created if needed.
+
+    Returns:
+        int: The number of the jobs moved.
+    """
+    engine = create_engine(url)
+    tables = {name: SQLAlchemyJobStore(engine=engine, tablename=name).jobs_t
+              for name in {*tablenames, *(name for name in inspect(engine).get_table_names()
+                                           if name.startswith(prefix))}}
+    for name in tablenames:
+        tables[name].create(engine, checkfirst=True)
+    moved = 0
+    with engine.begin() as connection:
+        for name, table in tables.items():
+            for job_id, next_run_time, job_state in connection.execute(
+                    select(table.c.id, table.c.next_run_time, table.c.job_state)).all():
+                _, _, chat_id, _ = pickle.loads(job_state)["args"]
+                target = owner(chat_id)
+                if target == name:
+                    continue
+                connection.execute(tables[target].insert().values(id=job_id, next_run_time=next_run_time,
+                                                                  job_state=job_state))
+                connection.execute(table.delete().where(table.c.id == job_id))
+                moved += 1
+    engine.dispose()
+    return moved
@@ -0,0 +1,58 @@
+import time
+from typing import Hashable
+
+
+class DecayingCounter:
+    def __init__(self, half_life: float = 60*60, max_keys: int = 10_000):
+        """
+        Initializes the counter of the events whose weight halves every half_life seconds, so the top keys follow
+        the recent popularity.
+
+        The decay is not applied to every key on every event: instead each event is weighted by the growing factor
+        2 ** (t / half_life), which keeps the order of the keys the same; the scores are rescaled once the factor
+        becomes large.
+
+        Parameters:
+            half_life (float): The half-life of the events in seconds. Defaults to 1 hour.
+            max_keys (int): The maximum number of the keys tracked, the least popular ones are dropped beyond it.
+                Defaults to 10_000.
+        """
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self.scores: dict[Hashable, float] = {}
+        self.origin = time.monotonic()
+
+    def _weight(self) -> float:
+        exponent = (time.monotonic() - self.origin) / self.half_life
+        if exponent > 64:
+            factor = 2 ** -exponent
+            self.scores = {key: score * factor for key, score in self.scores.items() if score * factor > 1e-9}
+            self.origin = time.monotonic()
+            exponent = 0
+        return 2 ** exponent
+
+    def add(self, key: Hashable) -> None:
+        """
+        Counts an event of the key.
+        """
+        self.scores[key] = self.scores.get(key, 0.0) + self._weight()
+        if len(self.scores) > self.max_keys * 2:
+            self.scores = dict(self.top(self.max_keys, with_scores=True))
+
+    def top(self, n: int, with_scores: bool = False) -> list:
+        """
+        Returns the n most popular keys (with their internal scores if with_scores, comparable to each other only).
+        """
+        top = sorted(self.scores.items(), key=lambda item: -item[1])[:n]
+        if with_scores:
+            return top
+        return [key for key, _ in top]
+
+    def score(self, key: Hashable) -> float:
+        """
+        Returns the decayed score of the key (the number of events, each counted with its decayed weight).
+        """
+        return self.scores.get(key, 0.0) / self._weight()
+
+    def __len__(self) -> int:
+        return len(self.scores)
@@ -0,0 +1,75 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, Callable
+from loguru import logger
+from utilities.settings import get_settings
+
+
+class Executors:
+    def __init__(self, processes: int = 0, process_threshold: int = 1_000_000):
+        """
+        Initializes the executors to offload CPU-bound work from the event loop.
+
+        The work is either run inline or in the process pool: a thread would hold the GIL of the event loop process
+        all the same, so it only adds the cost of the handoff. Jobs of process_threshold size and larger (sized by
+        the caller, e.g. the length of the text to be parsed) and the jobs known to be heavy (see run_heavy) are run
+        in the process pool if it is enabled, the rest is run inline. The pool is created on the first use.
+
+        Parameters:
+            processes (int): The size of the process pool, 0 disables it (everything is run inline). Defaults to 0.
+            process_threshold (int): The minimum size of the job to be run in the process pool.
+                Defaults to 1_000_000.
+        """
+        self.processes = processes
+        self.process_threshold = process_threshold
+        self._process_pool = None
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(self.processes)
+        return self._process_pool
+
+    async def run(self, func: Callable[..., Any], *args: Any, size: int = 0) -> Any:
+        """
+        Runs the function inline or in the process pool depending on the size of the job.
+
+        Parameters:
+            func (Callable[..., Any]): The function to run; has to be picklable (module-level) to be run in the
+                process pool.
+            *args (Any): The arguments of the function.
+            size (int): The size of the job. Defaults to 0 (run inline).
+
+        Returns:
+            Any: The result of the function.
+        """
+        if size < self.process_threshold:
+            return func(*args)
+        return await self.run_heavy(func, *args)
+
+    async def run_heavy(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Runs the function in the process pool if it is enabled, inline otherwise.
+        """
+        if self.processes <= 0:
+            return func(*args)
+        logger.trace(f"Running {func.__name__} in the process pool")
+        return await asyncio.get_running_loop().run_in_executor(self.process_pool, partial(func, *args))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shuts the pool down (it is recreated if used again).
+        """
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait)
+        self._process_pool = None
+
+
+@lru_cache(maxsize=None)
+def get_executors() -> Executors:
+    """
+    Returns the executors of the process configured by the settings.
+    """
+    settings = get_settings()
+    return Executors(settings.executor_processes, settings.process_threshold)
@@ -0,0 +1,119 @@
+from loguru import logger
+from typing import Any, Hashable, Iterable
+
+
+def bounded_distance(a: str, b: str, max_distance: int) -> int | None:
+    """
+    Calculates the optimal string alignment distance (Levenshtein distance with transpositions) between two strings.
+
+    The calculation stops as soon as the distance is known to exceed max_distance.
+
+    Parameters:
+        a (str): The first string.
+        b (str): The second string.
+        max_distance (int): The maximum distance of interest.
+
+    Returns:
+        int | None: The distance, or None if it exceeds max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    prev_prev = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev_prev[j - 2] + 1)
+        if min(cur) > max_distance:
+            return None
+        prev_prev, prev = prev, cur
+    return prev[-1] if prev[-1] <= max_distance else None
+
+
+class FuzzyIndex:
+    def __init__(self, max_distance: int = 2):
+        """
+        Initializes an empty typo-tolerant index (SymSpell-like deletion dictionary).
+
+        Every term is stored along with all its variants with up to max_distance deleted characters, so a lookup
+        only needs to generate deletions of the requested word instead of comparing it to every term.
+
+        Parameters:
+            max_distance (int): The maximum edit distance to be tolerated. Defaults to 2.
+        """
+        self.max_distance = max_distance
+        self.terms: dict[str, set] = {}
+        self.deletes: dict[str, set[str]] = {}
+        self.max_term_length = 0
+
+    def _variants(self, word: str, depth: int) -> set[str]:
+        """
+        Generates all variants of the word with up to depth characters deleted (the word included).
+        """
+        variants = {word}
+        edge = {word}
+        for _ in range(depth):
+            edge = {w[:i] + w[i + 1:] for w in edge for i in range(len(w))} - variants
+            variants |= edge
+        return variants
+
+    def add(self, term: str, value: Hashable) -> None:
+        """
+        Adds the term to the index.
+
+        Parameters:
+            term (str): The term to be added (expected to be lowercase).
+            value (Hashable): The value to be returned for the term.
+        """
+        if term in self.terms:
+            self.terms[term].add(value)
+            return
+        self.terms[term] = {value}
+        self.max_term_length = max(self.max_term_length, len(term))
+        for variant in self._variants(term, self.max_distance):
+            self.deletes.setdefault(variant, set()).add(term)
+
+    def lookup(self, word: str) -> list[tuple[int, Any]]:
+        """
+        Finds the values of all terms within max_distance of the word.
+
+        The tolerated distance also depends on the word length, so short words (like currency codes) do not match
+        everything: no typos for 1-2 characters, 1 typo for 3-6 characters, max_distance typos for longer words.
+        The words longer than any term by more than the tolerated distance match nothing, so they are not looked up
+        (the number of the deletions grows quadratically with the length).
+
+        Parameters:
+            word (str): The word to look up (expected to be lowercase).
+
+        Returns:
+            list[tuple[int, Any]]: The pairs of (distance, value) sorted by distance; each value is listed once.
+        """
+        limit = min(self.max_distance, 0 if len(word) < 3 else 1 if len(word) < 7 else 2)
+        if limit == 0 or len(word) > self.max_term_length + limit:
+            return []
+        candidates = set()
+        for variant in self._variants(word, limit):
+            candidates |= self.deletes.get(variant, set())
+        found = {}
+        for term in candidates:
+            distance = bounded_distance(word, term, limit)
+            if distance is None:
+                continue
+            for value in self.terms[term]:
+                if distance < found.get(value, limit + 1):
+                    found[value] = distance
+        return sorted(((distance, value) for value, distance in found.items()), key=lambda pair: pair[0])
+
+    @classmethod
+    def build(cls, items: Iterable[tuple[str, Hashable]], max_distance: int = 2) -> "FuzzyIndex":
+        """
+        Builds the index from the pairs of (term, value).
+        """
+        index = cls(max_distance)
+        for term, value in items:
+            index.add(term, value)
+        logger.trace(f"{cls.__name__} built: {len(index.terms)} terms, {len(index.deletes)} deletes")
+        return index
@@ -0,0 +1,19 @@
+import sys
+from loguru import logger
+
+
+FORMAT = "<green>{time}</green> | <blue>{module}</blue> | <lvl>{level}</lvl> | {extra[trace_id]} | {message}"
+
+
+def configure_logging(level: str = "TRACE") -> None:
+    """
+    Configures the loguru logger for the whole process. Is called once by the entry point of the process
+    (the modules themselves do not reconfigure the logger on import).
+    The messages are tagged with the id of the current trace (see utilities.tracing), '-' outside of traces.
+
+    Parameters:
+        level (str): The minimum level of the messages to be logged. Defaults to "TRACE".
+    """
+    logger.remove()
+    logger.configure(extra={"trace_id": "-"})
+    logger.add(sys.stdout, level=level, format=FORMAT, serialize=False)
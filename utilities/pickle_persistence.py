@@ -0,0 +1,134 @@
+import asyncio
+import io
+import os
+import pickle
+from pathlib import Path
+from typing import Any
+from loguru import logger
+from telegram import Bot
+from telegram.ext import PicklePersistence
+
+
+# the persistent id PicklePersistence replaces its bot with when loading the file
+KNOWN_BOT = "a known bot replaced by PTB's PicklePersistence"
+
+
+def write_atomically(path: Path, data: bytes) -> None:
+    """
+    Writes the data to a temporary file of the process and replaces the file at path with it, so the file is never
+    left truncated. The temporary file is removed if the write fails.
+    """
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+class BotPickler(pickle.Pickler):
+    def __init__(self, bot: Bot, file: io.BytesIO):
+        """
+        Pickles the data in the format PicklePersistence loads: the references to the bot are written as KNOWN_BOT
+        and restored as the bot of the application. The Telegram objects are pickled without their bot (see
+        TelegramObject.__getstate__).
+        """
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.bot = bot
+
+    def persistent_id(self, obj: Any) -> str | None:
+        return KNOWN_BOT if obj is self.bot else None
+
+
+def dump(bot: Bot, data: Any) -> bytes:
+    """
+    Pickles the data with BotPickler.
+    """
+    buffer = io.BytesIO()
+    BotPickler(bot, buffer).dump(data)
+    return buffer.getvalue()
+
+
+class DirtyPicklePersistence(PicklePersistence):
+    def __init__(self, filepath: str, update_interval: float = 60):
+        """
+        Initializes the persistence keeping all the data in a single pickle file (as PicklePersistence does).
+
+        Unlike PicklePersistence, the file is not rewritten on every change, but by flush only, and only if the data
+        was changed since the previous flush. The data is pickled and the file is written (atomically) in a thread:
+        PTB hands the deep copies of the data over to the persistence, and they are replaced rather than changed,
+        so the copies of the dicts holding them, made on the event loop, are consistent.
+        Flushing periodically keeps the flush on shutdown cheap.
+        The flushes are serialized, and a write once started is finished even if the flush awaiting it is cancelled,
+        so the final flush never races a periodic one.
+
+        Parameters:
+            filepath (str): The file to keep the data in.
+            update_interval (float): How often PTB passes the changed data to the persistence, in seconds.
+        """
+        super().__init__(filepath=filepath, on_flush=True, update_interval=update_interval)
+        self.dirty = False
+        self._flush_lock = asyncio.Lock()
+
+    # PTB passes the data of every chat and user seen on every update interval, so it is compared as
+    # PicklePersistence does
+    async def update_conversation(self, name: str, key: Any, new_state: object | None) -> None:
+        self.dirty |= (self.conversations or {}).get(name, {}).get(key) != new_state
+        await super().update_conversation(name, key, new_state)
+
+    async def update_user_data(self, user_id: int, data: Any) -> None:
+        self.dirty |= (self.user_data or {}).get(user_id) != data
+        await super().update_user_data(user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: Any) -> None:
+        self.dirty |= (self.chat_data or {}).get(chat_id) != data
+        await super().update_chat_data(chat_id, data)
+
+    async def update_bot_data(self, data: Any) -> None:
+        self.dirty |= self.bot_data != data
+        await super().update_bot_data(data)
+
+    async def update_callback_data(self, data: Any) -> None:
+        self.dirty |= self.callback_data != data
+        await super().update_callback_data(data)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self.dirty |= chat_id in (self.chat_data or {})
+        await super().drop_chat_data(chat_id)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self.dirty |= user_id in (self.user_data or {})
+        await super().drop_user_data(user_id)
+
+    async def flush(self) -> None:
+        """
+        Writes the data to the file if it was changed since the previous flush. If the flush is cancelled, the write
+        in progress is finished anyway (and the next flush waits for it).
+        """
+        await asyncio.shield(asyncio.ensure_future(self._flush()))
+
+    async def _flush(self) -> None:
+        async with self._flush_lock:
+            if not self.dirty:
+                logger.trace(f"{self.filepath} is up to date")
+                return
+            # reset before pickling, so the changes made while the file is written mark the data dirty again
+            self.dirty = False
+            try:
+                data = {
+                    "conversations": {name: dict(states) for name, states in (self.conversations or {}).items()},
+                    "user_data": dict(self.user_data or {}),
+                    "chat_data": dict(self.chat_data or {}),
+                    "bot_data": self.bot_data,
+                    "callback_data": self.callback_data,
+                }
+                payload = await asyncio.to_thread(dump, self.bot, data)
+                await asyncio.to_thread(write_atomically, self.filepath, payload)
+            except BaseException:
+                self.dirty = True
+                raise
+            logger.trace(f"{self.filepath} is written: {len(payload)} bytes")
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable
+from loguru import logger
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1):
+        """
+        Initializes the monitor of the event loop health: it measures how late the loop wakes up a sleeping task,
+        which is the time the loop was blocked by the other callbacks.
+
+        Parameters:
+            interval (float): The interval of the measurements in seconds. Defaults to 0.1.
+            threshold (float): The lag in seconds to be logged as a warning. Defaults to 0.1.
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self._task = None
+
+    def start(self) -> None:
+        """
+        Starts the monitor in the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.last_lag = loop.time() - start - self.interval
+            self.max_lag = max(self.max_lag, self.last_lag)
+            if self.last_lag > self.threshold:
+                self.stalls += 1
+                logger.warning(f"Event loop was blocked for {self.last_lag * 1000:.0f} ms")
+
+
+def detect_slow(callback: Callable[..., Any], threshold: float,
+                describe: Callable[[tuple], str] = lambda args: "") -> Callable[..., Any]:
+    """
+    Wraps the coroutine function to log a warning if its call takes longer than the threshold.
+
+    Parameters:
+        callback (Callable[..., Any]): The coroutine function to be wrapped (e.g. a PTB handler callback).
+        threshold (float): The duration in seconds to be logged.
+        describe (Callable[[tuple], str]): The function to describe the call by its arguments (e.g. by the type
+            of the update). Defaults to an empty description.
+
+    Returns:
+        Callable[..., Any]: The wrapped coroutine function.
+    """
+    name = getattr(callback, "__qualname__", repr(callback))
+
+    @wraps(callback)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await callback(*args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            if duration > threshold:
+                logger.warning(f"Slow handler {name} ({describe(args)}): {duration * 1000:.0f} ms")
+    return wrapper
+
+
+class SamplingProfiler:
+    def __init__(self, directory: str = ".", interval: float = 0.005):
+        """
+        Initializes the on-demand sampling profiler: while capturing, the stack of the profiled thread is sampled
+        every interval seconds; nothing is done between the captures.
+
+        The profile is written in the collapsed stacks format ('frame;frame;frame count' lines) which could be
+        rendered by flamegraph.pl, speedscope and similar tools.
+
+        Parameters:
+            directory (str): The directory to write the profiles to. Defaults to ".".
+            interval (float): The sampling interval in seconds. Defaults to 0.005.
+        """
+        self.directory = directory
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def capture(self, thread_id: int, seconds: float) -> str:
+        """
+        Samples the thread for the given time (blocking, so is supposed to be run in a separate thread).
+
+        Parameters:
+            thread_id (int): The id of the thread to be profiled (e.g. of the event loop thread).
+            seconds (float): The duration of the capture.
+
+        Returns:
+            str: The path of the profile written.
+
+        Raises:
+            RuntimeError: If another capture is in progress.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Profile capture is already in progress")
+        try:
+            stacks = Counter()
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                frame = sys._current_frames().get(thread_id)  # pylint: disable=W0212
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})")
+                    frame = frame.f_back
+                if stack:
+                    stacks[";".join(reversed(stack))] += 1
+                time.sleep(self.interval)
+            path = os.path.join(self.directory, f"profile-{datetime.now():%Y%m%d-%H%M%S}.collapsed")
+            with open(path, "w") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in stacks.most_common())
+            logger.info(f"Profile of {sum(stacks.values())} samples is written to '{path}'")
+            return path
+        finally:
+            self._lock.release()
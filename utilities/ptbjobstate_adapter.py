@@ -1,15 +1,8 @@
-from loguru import logger
-import sys
 from typing import Any
 from apscheduler.job import Job as APSJob
 from telegram.ext import Job as PTBJob, Application
 
 
-logger.remove()
-logger.add(sys.stdout, level="TRACE", format="<green>{time}</green> | <blue>{module}</blue> | <lvl>{level}</lvl> | {message}",
-           serialize=False)
-
-
 class PTBJobStateAdapter:
     def __init__(self, application: Application, callback_func, **kwargs: Any):
         """
@@ -0,0 +1,97 @@
+import os
+from dataclasses import dataclass, fields
+from functools import lru_cache
+from typing import Mapping
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    The configuration of the application. Every field is read from the environment variable of the same name
+    in upper case (e.g. TIMEOUT for timeout). Tuples are read as comma-separated lists (e.g. ADMIN_IDS=1,2).
+    """
+    token: str | None = None
+    botname: str | None = None
+    regexp: str | None = None
+    url: str | None = None
+    timeout: int = 10
+    persistence_file: str | None = None
+    help_msg: str | None = None
+    start_msg: str = "Hello!"
+    inline_page_size: int = 10
+    bot_api_url: str | None = None
+    fuzzy_max_distance: int = 2
+    psql_url: str | None = None
+    job_persistence: int = 0
+    persistence_interval: int = 60
+    shutdown_timeout: int = 10
+    workers: int = 1
+    snapshot_file: str = "data/rates.snapshot"
+    poll_timeout: int = 30
+    refresh_interval: int = 60*60
+    executor_processes: int = 0
+    process_threshold: int = 1_000_000
+    admin_ids: tuple[int, ...] = ()
+    profiling: int = 0
+    slow_handler_ms: int = 200
+    loop_lag_ms: int = 100
+    profile_seconds: int = 10
+    profile_dir: str = "."
+    money_precision: int = 28
+    exact_endpoints: tuple[str, ...] = ("chat", "notify")
+    admission_max_pending: int = 200
+    admission_max_lag_ms: int = 250
+    inline_stale_ms: int = 5000
+    hot_queries_size: int = 50
+    hot_queries_max_bytes: int = 1_000_000
+    hot_queries_half_life: int = 60*60
+    hot_queries_interval: int = 10*60
+    trace_sample_rate: float = 0.0
+    trace_exporter: str = "file"
+    trace_file: str = "traces.jsonl"
+    log_level: str = "TRACE"
+    startup_report: int = 0
+
+    @classmethod
+    def from_env(cls, env: Mapping[str, str] = os.environ) -> "Settings":
+        """
+        Parses the settings from the environment, the defaults are used for the variables which are not set.
+
+        :param env: The environment to parse. Defaults to os.environ.
+        :return: Settings object.
+        :raises ValueError: If a value could not be converted to the type of the field.
+        """
+        values = {}
+        for field in fields(cls):
+            raw = env.get(field.name.upper())
+            if raw is None:
+                continue
+            if field.type is int:
+                try:
+                    values[field.name] = int(raw)
+                except ValueError:
+                    raise ValueError(f"{field.name.upper()} must be an integer: '{raw}'") from None
+            elif field.type is float:
+                try:
+                    values[field.name] = float(raw)
+                except ValueError:
+                    raise ValueError(f"{field.name.upper()} must be a number: '{raw}'") from None
+            elif field.type == tuple[str, ...]:
+                values[field.name] = tuple(item.strip() for item in raw.split(",") if item.strip())
+            elif field.type == tuple[int, ...]:
+                try:
+                    values[field.name] = tuple(int(item) for item in raw.split(",") if item.strip())
+                except ValueError:
+                    raise ValueError(f"{field.name.upper()} must be a comma-separated list of integers: "
+                                     f"'{raw}'") from None
+            else:
+                values[field.name] = raw
+        return cls(**values)
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Returns the settings parsed from the environment once per process.
+    """
+    return Settings.from_env()
@@ -0,0 +1,58 @@
+from loguru import logger
+import mmap
+import os
+import struct
+
+
+MAGIC = b"RATE"
+HEADER = struct.Struct("<4sIQ")  # magic, format version, payload length
+FORMAT_VERSION = 2
+
+
+def write_snapshot(path: str, payload: bytes) -> None:
+    """
+    Writes the payload to the snapshot file shared between processes.
+
+    The file is written next to the target and then atomically renamed, so the readers never see a partially
+    written snapshot; the readers which have already mapped the previous file keep reading it consistently.
+    The directory of the file is created if missing.
+
+    Parameters:
+        path (str): The path of the snapshot file.
+        payload (bytes): The data to be stored (e.g. RatesSnapshot.to_bytes).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(payload)))
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    logger.trace(f"Snapshot written to '{path}': {len(payload)} bytes")
+
+
+def read_snapshot(path: str) -> memoryview:
+    """
+    Maps the payload of the snapshot file shared between processes (read-only). Nothing is copied: the pages are
+    shared with the other readers and the mapping lives as long as the memoryview returned (or its slices).
+
+    Parameters:
+        path (str): The path of the snapshot file.
+
+    Returns:
+        memoryview: The payload stored.
+
+    Raises:
+        ValueError: If the file is not a valid snapshot.
+    """
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mm) < HEADER.size:
+        mm.close()
+        raise ValueError(f"Snapshot '{path}' is truncated")
+    magic, version, length = HEADER.unpack_from(mm)
+    if magic != MAGIC or version != FORMAT_VERSION or len(mm) < HEADER.size + length:
+        mm.close()
+        raise ValueError(f"Snapshot '{path}' is invalid: {magic=}, {version=}, {length=}")
+    return memoryview(mm)[HEADER.size:HEADER.size + length]
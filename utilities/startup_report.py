@@ -0,0 +1,40 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from loguru import logger
+
+
+class StartupReport:
+    def __init__(self, started: float, enabled: bool = True):
+        """
+        Initializes the report of the startup phases (imports of the subsystems, initialization), which helps to see
+        where the startup time is spent along with `python -X importtime app.py`.
+
+        Parameters:
+            started (float): The time.perf_counter() value at the process start.
+            enabled (bool): Whether the report is logged. Defaults to True.
+        """
+        self.started = started
+        self.enabled = enabled
+        self.phases: list[tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Measures the duration of the phase.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def log(self) -> None:
+        """
+        Logs the durations of the phases, slowest first, and the total time since the process start.
+        """
+        if not self.enabled:
+            return
+        for name, duration in sorted(self.phases, key=lambda phase: -phase[1]):
+            logger.info(f"startup: {duration * 1000:8.1f} ms | {name}")
+        logger.info(f"startup: {(time.perf_counter() - self.started) * 1000:8.1f} ms | total")
@@ -0,0 +1,257 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import lru_cache, wraps
+from typing import Any, Callable, Protocol
+from loguru import logger
+from utilities.settings import get_settings
+
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+_NOOP = nullcontext()
+
+
+class Span:
+    def __init__(self, tracer: "Tracer", name: str, parent: "Span | None" = None, **attributes: Any):
+        """
+        Initializes the timed span of the trace. The span becomes the current one (propagated through contextvars,
+        so across awaits of the same task) once entered, and is recorded by the tracer on exit.
+
+        Parameters:
+            tracer (Tracer): The tracer to record the span with.
+            name (str): The name of the span.
+            parent (Span, optional): The parent span; a new trace is started if not provided.
+            **attributes (Any): The attributes of the span.
+        """
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.root = parent.root if parent else self
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.attributes = attributes
+        self.start_ns = self.end_ns = 0
+        self.error = None
+        self.spans: list[Span] = [] if parent is None else self.root.spans
+        self._token = None
+        self._log_context = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        if self.parent is None:
+            self._log_context = logger.contextualize(trace_id=self.trace_id)
+            self._log_context.__enter__()
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.end_ns = time.time_ns()
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.spans.append(self)
+        if self.parent is None:
+            self._log_context.__exit__(exc_type, exc, tb)
+            self.tracer.exporter.export(self.spans)
+
+
+class UnsampledTrace:
+    def __init__(self):
+        """
+        The trace which is not recorded: only its id is attached to the log messages.
+        """
+        self.trace_id = os.urandom(16).hex()
+        self._log_context = logger.contextualize(trace_id=self.trace_id)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self) -> "UnsampledTrace":
+        self._log_context.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._log_context.__exit__(exc_type, exc, tb)
+
+
+class SpanExporter(Protocol):
+    def export(self, spans: list[Span]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self, timeout: float | None = None) -> None:
+        """
+        Exports the traces buffered (if any) and stops the exporter.
+        """
+
+
+class InMemoryCollector(SpanExporter):
+    def __init__(self, max_traces: int = 1000):
+        """
+        Keeps the last max_traces traces in memory (e.g. for the benchmarks and the admin commands).
+        """
+        self.traces: deque[list[Span]] = deque(maxlen=max_traces)
+
+    def export(self, spans: list[Span]) -> None:
+        self.traces.append(spans)
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPFileExporter(SpanExporter):
+    def __init__(self, path: str, service_name: str = "currency-converter-bot", schedule_delay: float = 5.0,
+                 max_batch_size: int = 512, max_queue_size: int = 2048):
+        """
+        Appends the traces to the file in the OTLP/JSON format, one trace (ExportTraceServiceRequest) per line,
+        as the file exporter of the OpenTelemetry Collector does, so the file could be replayed to any OTLP backend.
+
+        As the BatchSpanProcessor of OpenTelemetry does, the traces are only queued by export (it is called on the
+        event loop), while a background thread converts and writes them in batches: every schedule_delay seconds
+        or once max_batch_size traces are queued. The traces exceeding max_queue_size are dropped (counted in
+        self.dropped). The traces queued are written by shutdown.
+
+        Parameters:
+            path (str): The file to append the traces to.
+            service_name (str): The service.name attribute of the resource.
+            schedule_delay (float): The maximum delay of the write of a trace, in seconds. Defaults to 5.
+            max_batch_size (int): The number of the traces queued which triggers the write. Defaults to 512.
+            max_queue_size (int): The maximum number of the traces queued. Defaults to 2048.
+        """
+        self.path = path
+        self.resource = {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]}
+        self.schedule_delay = schedule_delay
+        self.max_batch_size = max_batch_size
+        self.max_queue_size = max_queue_size
+        self.dropped = 0
+        self._queue: list[list[Span]] = []
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+
+    def export(self, spans: list[Span]) -> None:
+        with self._condition:
+            if self._stopped or len(self._queue) >= self.max_queue_size:
+                self.dropped += 1
+                return
+            self._queue.append(spans)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="otlp-file-exporter", daemon=True)
+                self._thread.start()
+            if len(self._queue) >= self.max_batch_size:
+                self._condition.notify()
+
+    def shutdown(self, timeout: float | None = None) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.dropped:
+            logger.warning(f"{self.dropped} traces are dropped by the exporter to '{self.path}'")
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._stopped and len(self._queue) < self.max_batch_size:
+                    self._condition.wait(self.schedule_delay)
+                batch, self._queue = self._queue, []
+                stopped = self._stopped
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    logger.error(f"{len(batch)} traces are not written to '{self.path}': {e}")
+            if stopped:
+                return
+
+    def _write(self, batch: list[list[Span]]) -> None:
+        lines = [json.dumps(self._request(spans), ensure_ascii=False) + "\n" for spans in batch]
+        with open(self.path, "a") as f:
+            f.writelines(lines)
+
+    def _request(self, spans: list[Span]) -> dict:
+        otlp_spans = [{
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent.span_id if span.parent else "",
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+        } for span in spans]
+        return {"resourceSpans": [{"resource": self.resource,
+                                   "scopeSpans": [{"scope": {"name": __name__}, "spans": otlp_spans}]}]}
+
+
+class Tracer:
+    def __init__(self, exporter: SpanExporter, sample_rate: float = 1.0):
+        """
+        Initializes the tracer.
+
+        Parameters:
+            exporter (SpanExporter): The exporter of the finished traces.
+            sample_rate (float): The share of the traces to be recorded (0 - none, 1 - all). Defaults to 1.0.
+        """
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    def trace(self, name: str, **attributes: Any) -> Span | UnsampledTrace:
+        """
+        Starts a new trace (e.g. per update) with the root span of the given name. The trace id is attached to the
+        log messages either way, while the spans are only recorded for the sampled traces.
+        """
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return Span(self, name, **attributes)
+        return UnsampledTrace()
+
+
+@lru_cache(maxsize=None)
+def get_tracer() -> Tracer:
+    """
+    Returns the tracer of the process configured by the settings.
+    """
+    settings = get_settings()
+    exporter = InMemoryCollector() if settings.trace_exporter == "memory" else OTLPFileExporter(settings.trace_file)
+    return Tracer(exporter, settings.trace_sample_rate)
+
+
+def span(name: str, **attributes: Any) -> Span | nullcontext:
+    """
+    Returns the child span of the current one, or a no-op context manager if there is no sampled trace.
+
+    Usage:
+        with span("match_curr", query=query):
+            ...
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP
+    return Span(parent.tracer, name, parent, **attributes)
+
+
+def traced(tracer: Tracer, name: str, callback: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wraps the coroutine function (e.g. a job callback) to run each call within a new trace of the given name.
+    """
+    @wraps(callback)
+    async def wrapper(*args, **kwargs):
+        with tracer.trace(name):
+            return await callback(*args, **kwargs)
+    return wrapper